@@ -9,12 +9,24 @@ from app.routes.classes_genres import meta_bp
 from app.routes.classes_genres import classes_bp
 from app.routes.auth import users_bp
 from app.routes.analytics import analytics_bp
+from app.compression import init_compression
+from app.instrumentation import init_instrumentation
+from app.serializers import init_json
+from app.metrics import init_metrics
+from app.routes.metrics import metrics_bp
+from app.cli import (
+    counts_cli, create_tables_command, invoice_batch_command, reprice_command, rollup_cli, search_cli,
+)
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
     db.init_app(app)
+    init_json(app)
+    init_instrumentation(app)
+    init_metrics(app)
+    init_compression(app)
 
     app.register_blueprint(clients_bp)
     app.register_blueprint(products_bp)
@@ -24,5 +36,13 @@ def create_app():
     app.register_blueprint(classes_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(analytics_bp)
+    app.register_blueprint(metrics_bp)
+
+    app.cli.add_command(create_tables_command)
+    app.cli.add_command(rollup_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(counts_cli)
+    app.cli.add_command(reprice_command)
+    app.cli.add_command(invoice_batch_command)
 
     return app
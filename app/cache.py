@@ -0,0 +1,267 @@
+import hashlib
+import importlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+
+
+class MemoryBackend:
+    """
+    Bounded LRU store private to one worker process.
+
+    Any object with the same get/set/delete/items/clear methods can be
+    configured instead (ANALYTICS_CACHE_BACKEND), e.g. one backed by a
+    store shared by all gunicorn workers so invalidations reach them all.
+    Values are (bytes, metadata) pairs; metadata is JSON-serializable.
+
+    ``mark``/``marked`` keep short-lived flags beside the entries: they
+    take no LRU slot, are never evicted and don't count as entries.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._marks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value, meta = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value, meta
+
+    def set(self, key, value, meta, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value, meta)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self):
+        with self._lock:
+            return [(k, meta) for k, (_, _, meta) in self._data.items()]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def mark(self, name, ttl):
+        with self._lock:
+            self._marks[name] = time.monotonic() + ttl
+
+    def marked(self, name):
+        with self._lock:
+            expires = self._marks.get(name)
+            return expires is not None and expires >= time.monotonic()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    """
+    TTL cache for serialized JSON responses.
+
+    Each entry remembers the UTC ranges of orders it was computed from,
+    so a write only evicts the entries whose ranges cover the orders it
+    touched.
+
+    Every invalidation also marks the backend for ``fresh_window``
+    seconds (the follower read staleness), so every worker sharing the
+    backend knows a follower read could miss the write. Backends without
+    ``mark``/``marked`` store the marker as an ordinary entry instead.
+    """
+
+    INVALIDATED = "invalidated"
+
+    def __init__(self, backend, ttl, fresh_window=0):
+        self.backend = backend
+        self.ttl = ttl
+        self.fresh_window = fresh_window
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(endpoint, params):
+        raw = json.dumps([endpoint, params], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key):
+        """Return (body, etag) for a cached response, or None."""
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        body, meta = value
+        return body, meta.get("etag")
+
+    def set(self, key, body, ranges, etag=None):
+        now = time.time()
+        meta = {"etag": etag, "ranges": [
+            # Ranges ending "now" also cover orders written after this
+            # response was computed, so they are stored open-ended
+            (_ts(a), None if _ts(b) >= now - 1 else _ts(b))
+            for a, b in ranges
+        ]}
+        self.backend.set(key, body, meta, self.ttl)
+
+    def invalidate(self, *timestamps):
+        """
+        Drop entries covering any of ``timestamps`` (datetimes of changed
+        orders). Without timestamps everything is dropped.
+        """
+        if not timestamps:
+            self.backend.clear()
+        else:
+            points = [_ts(t) for t in timestamps if t is not None]
+            for key, meta in self.backend.items():
+                if key == self.INVALIDATED:
+                    continue
+                ranges = meta.get("ranges")
+                if not ranges or any(
+                    a <= p and (b is None or p < b)
+                    for p in points for a, b in ranges
+                ):
+                    self.backend.delete(key)
+
+        if not self.fresh_window:
+            return
+        if hasattr(self.backend, "mark"):
+            self.backend.mark(self.INVALIDATED, self.fresh_window)
+        else:
+            self.backend.set(self.INVALIDATED, b"", {}, self.fresh_window)
+
+    def recently_invalidated(self):
+        """True within ``fresh_window`` seconds of any invalidation."""
+        if not self.fresh_window:
+            return False
+        if hasattr(self.backend, "marked"):
+            return self.backend.marked(self.INVALIDATED)
+        return self.backend.get(self.INVALIDATED) is not None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.backend) if hasattr(self.backend, "__len__") else None,
+            "ttl": self.ttl,
+            "backend": type(self.backend).__name__,
+        }
+
+
+def _ts(dt):
+    # Orders come back as naive UTC datetimes
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _load_backend(path, **kwargs):
+    module_name, attr = path.split(":")
+    return getattr(importlib.import_module(module_name), attr)(**kwargs)
+
+
+def get_response_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get("response_cache")
+    if cache is None:
+        backend = _load_backend(
+            app.config["ANALYTICS_CACHE_BACKEND"],
+            max_entries=app.config["ANALYTICS_CACHE_MAX_ENTRIES"],
+        )
+        fresh_window = (
+            app.config["FOLLOWER_READ_STALENESS"] if app.config["ANALYTICS_FOLLOWER_READS"] else 0
+        )
+        cache = ResponseCache(backend, app.config["ANALYTICS_CACHE_TTL"], fresh_window)
+        app.extensions["response_cache"] = cache
+    return cache
+
+
+def cache_ranges(*ranges):
+    """Record the (start_utc, end_utc) ranges the current response reads."""
+    g.setdefault("cache_ranges", []).extend(ranges)
+
+
+def cached_response(key_params):
+    """
+    Cache a view's 200 JSON responses.
+
+    ``key_params(args)`` turns the query string into the normalized
+    parameters the response depends on; returning None skips the cache.
+    The view reports the order ranges it read through ``cache_ranges``.
+    Cached responses carry an ETag of their body, so a client holding the
+    same body gets a 304 on a hit.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config["ANALYTICS_CACHE_TTL"]:
+                return view(*args, **kwargs)
+
+            try:
+                params = key_params(request.args)
+            except (ValueError, TypeError):
+                params = None
+            if params is None:
+                return view(*args, **kwargs)
+
+            cache = get_response_cache()
+            key = cache.key(request.endpoint, params)
+
+            cached = cache.get(key)
+            if cached is not None:
+                body, etag = cached
+                if etag and request.if_none_match.contains_weak(etag):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.response_class(body, mimetype="application/json")
+                if etag:
+                    response.set_etag(etag)
+                    response.headers["Cache-Control"] = "no-cache"
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            g.cache_ranges = []
+            # A follower read may predate the write behind a recent
+            # invalidation and would be cached for the full TTL
+            g.fresh_reads = cache.recently_invalidated()
+            response = make_response(view(*args, **kwargs))
+            # Invalidated while a follower read ran: it may predate the write
+            stale = g.get("follower_read") and cache.recently_invalidated()
+            if response.status_code == 200 and response.is_json and not stale:
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                cache.set(key, body, g.cache_ranges, etag)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "no-cache"
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidate_orders(*timestamps):
+    """
+    Call after committing order writes with the createdAt values that
+    were added, removed or changed (old and new). With no timestamps the
+    whole cache is dropped.
+    """
+    get_response_cache().invalidate(*timestamps)
@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from app.counts import rebuild_row_counts
+from app.invoice_batch import FORMATS as BATCH_FORMATS, iter_invoice_zip
+from app.models import db
+from app.rollup import rebuild_rollup, verify_rollup
+from app.search import create_search_indexes
+from app.services import parse_eat_datetime, reprice_product
+
+rollup_cli = AppGroup("rollup", help="Maintain the daily_revenue rollup table.")
+search_cli = AppGroup("search", help="Manage the indexes used by order search.")
+counts_cli = AppGroup("counts", help="Maintain the row_counts table behind list totals.")
+
+
+def _report_mismatches(rows, limit=20):
+    for r in rows[:limit]:
+        click.echo(
+            f"  {r.day} client={r.client_id} product={r.product_id}: "
+            f"rollup={r.rollup_revenue:.2f}/{r.rollup_orders} "
+            f"raw={r.raw_revenue:.2f}/{r.raw_orders}"
+        )
+    if len(rows) > limit:
+        click.echo(f"  ... and {len(rows) - limit} more")
+
+
+@click.command("create-tables")
+@with_appcontext
+def create_tables_command():
+    """Create any missing tables (daily_revenue, table_versions, row_counts, ...)."""
+    db.create_all()
+    click.echo("Tables created.")
+
+
+@rollup_cli.command("rebuild")
+def rebuild_command():
+    """Backfill daily_revenue from the orders table and verify it."""
+    rebuild_rollup()
+    mismatches = verify_rollup()
+    if mismatches:
+        db.session.rollback()
+        click.echo(f"Rebuild produced {len(mismatches)} mismatching rows, rolled back:")
+        _report_mismatches(mismatches)
+        raise SystemExit(1)
+
+    db.session.commit()
+    click.echo("daily_revenue rebuilt and verified.")
+
+
+@rollup_cli.command("verify")
+def verify_command():
+    """Check daily_revenue against the raw orders table."""
+    mismatches = verify_rollup()
+    if mismatches:
+        click.echo(f"{len(mismatches)} mismatching rows:")
+        _report_mismatches(mismatches)
+        raise SystemExit(1)
+    click.echo("daily_revenue matches orders.")
+
+
+@counts_cli.command("rebuild")
+def rebuild_counts_command():
+    """Recount orders and clients into row_counts."""
+    counts = rebuild_row_counts()
+    db.session.commit()
+    click.echo(", ".join(f"{name}: {count}" for name, count in counts.items()))
+
+
+@search_cli.command("create-indexes")
+def create_indexes_command():
+    """Create order foreign key indexes and trigram name indexes."""
+    create_search_indexes()
+    db.session.commit()
+    click.echo("Search indexes created.")
+
+
+@click.command("reprice")
+@click.argument("product_id")
+@click.option("--start", help="Only orders on/after this date (EAT, ISO format).")
+@click.option("--end", help="Only orders on/before this date (EAT, ISO format).")
+@click.option("--chunk-size", default=5000, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Report the revenue delta without writing.")
+@with_appcontext
+def reprice_command(product_id, start, end, chunk_size, dry_run):
+    """Recompute totalCost of a product's orders at its current price."""
+    def progress(chunks, updated, delta):
+        click.echo(f"  chunk {chunks}: {updated} orders updated, revenue delta {delta:+.2f}")
+
+    result = reprice_product(
+        product_id,
+        start=parse_eat_datetime(start) if start else None,
+        end=parse_eat_datetime(end) if end else None,
+        chunk_size=chunk_size,
+        dry_run=dry_run,
+        progress=progress,
+    )
+
+    if dry_run:
+        click.echo(
+            f"{result['updated']} of {result['matched']} orders would change, "
+            f"revenue delta {result['revenueDelta']:+.2f}"
+        )
+    else:
+        click.echo(
+            f"Repriced {result['updated']} orders in {result['chunks']} chunks, "
+            f"revenue delta {result['revenueDelta']:+.2f}"
+        )
+
+
+@click.command("invoice-batch")
+@click.option("--start", required=True, help="First day of the period (ISO date).")
+@click.option("--end", required=True, help="Last day of the period (ISO date).")
+@click.option("--format", "fmt", type=click.Choice(list(BATCH_FORMATS)), default="excel", show_default=True)
+@click.option("--output", "-o", required=True, type=click.Path(dir_okay=False), help="ZIP file to write.")
+@click.option("--workers", type=int, help="Render processes (default: number of CPUs).")
+@with_appcontext
+def invoice_batch_command(start, end, fmt, output, workers):
+    """Render every client's invoice for a period into one ZIP."""
+    start_date = datetime.fromisoformat(start)
+    end_date = datetime.fromisoformat(end).replace(hour=23, minute=59, second=59)
+
+    if workers:
+        current_app.config["BATCH_INVOICE_WORKERS"] = workers
+    with open(output, "wb") as out:
+        for chunk in iter_invoice_zip(start_date, end_date, fmt):
+            out.write(chunk)
+    click.echo(f"Wrote {output}")
@@ -0,0 +1,210 @@
+"""
+Negotiated response compression.
+
+JSON and other text responses of at least COMPRESSION_MIN_SIZE bytes are
+compressed with the best encoding the client accepts: brotli or zstd when
+their packages are installed, gzip always. Streamed responses are
+compressed chunk by chunk and flushed after every chunk, so each chunk
+still reaches the client as soon as it is produced.
+
+Responses with a strong ETag (conditional views, cached analytics) are
+the same bytes every time until the ETag changes, so their compressed
+variants are kept in a per-worker LRU keyed by (ETag, encoding).
+"""
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional encoding
+    zstandard = None
+
+
+# ---- Encoders ----
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        # Deterministic output (no timestamp), so cached variants are stable
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class _Zstd:
+    name = "zstd"
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+def available_encoders(config):
+    """Encoders in order of preference when the client accepts several equally."""
+    encoders = []
+    if brotli is not None:
+        encoders.append(_Brotli(config["COMPRESSION_BROTLI_QUALITY"]))
+    if zstandard is not None:
+        encoders.append(_Zstd(config["COMPRESSION_ZSTD_LEVEL"]))
+    encoders.append(_Gzip(config["COMPRESSION_GZIP_LEVEL"]))
+    return encoders
+
+
+# ---- Compressed variant cache ----
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._data.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+
+# ---- Middleware ----
+
+def _stream(encoder, iterable):
+    try:
+        yield from encoder.stream(iterable)
+    finally:
+        # Closes files and ends stream_with_context's request context
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+class Compressor:
+    def __init__(self, app):
+        self.encoders = {e.name: e for e in available_encoders(app.config)}
+        self.mimetypes = set(app.config["COMPRESSION_MIMETYPES"])
+        self.min_size = app.config["COMPRESSION_MIN_SIZE"]
+        self.cache = CompressedCache(app.config["COMPRESSION_CACHE_MAX_BYTES"])
+
+    def negotiate(self):
+        name = request.accept_encodings.best_match(list(self.encoders))
+        return self.encoders.get(name)
+
+    def __call__(self, response):
+        if response.mimetype not in self.mimetypes and response.status_code != 304:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        if (
+            response.status_code != 200
+            or request.method == "HEAD"
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        encoder = self.negotiate()
+        if encoder is None:
+            return response
+
+        if response.is_streamed or response.direct_passthrough:
+            if request.range:
+                # Byte ranges refer to the uncompressed file
+                return response
+            response.response = _stream(encoder, response.response)
+            response.direct_passthrough = False
+            response.headers.pop("Content-Length", None)
+            response.headers.pop("Accept-Ranges", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                key = (etag, encoder.name)
+                body = self.cache.get(key)
+                if body is None:
+                    body = encoder.compress(data)
+                    self.cache.set(key, body)
+            else:
+                body = encoder.compress(data)
+            response.set_data(body)
+
+        response.headers["Content-Encoding"] = encoder.name
+        # The compressed bytes are a different representation; a weak ETag
+        # still matches If-None-Match, which compares weakly
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_compression(app):
+    """
+    Compress responses on the way out. Register after the other
+    after_request hooks so it runs first and they see the final body.
+    """
+    if not app.config["COMPRESSION_ENABLED"]:
+        return
+    compressor = Compressor(app)
+    app.extensions["compression_cache"] = compressor.cache
+    app.after_request(compressor)
@@ -1,9 +1,148 @@
+import os
+import tempfile
+
+DEFAULT_DATABASE_URL = (
+    "cockroachdb+psycopg://buxton:n9dvRcCzYB3D8fM2t7BWOw@"
+    "order-mgt-19894.j77.aws-ap-south-1.cockroachlabs.cloud:26257/"
+    "order-mgt"
+    "?sslmode=verify-full"
+    "&sslrootcert=certs/root.crt"
+)
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def database_url(url):
+    """
+    Accept the bare URLs hosting providers hand out (postgres://,
+    postgresql://, cockroachdb://) and select the psycopg 3 driver.
+    """
+    scheme, sep, rest = url.partition("://")
+    if scheme in ("postgres", "postgresql"):
+        return "postgresql+psycopg" + sep + rest
+    if scheme == "cockroachdb":
+        return "cockroachdb+psycopg" + sep + rest
+    return url
+
+
 class Config:
-    SQLALCHEMY_DATABASE_URI = (
-        "cockroachdb+psycopg://buxton:n9dvRcCzYB3D8fM2t7BWOw@"
-        "order-mgt-19894.j77.aws-ap-south-1.cockroachlabs.cloud:26257/"
-        "order-mgt"
-        "?sslmode=verify-full"
-        "&sslrootcert=certs/root.crt"
+    # DATABASE_URL may point at a local single-node cockroach
+    # (cockroachdb://root@localhost:26257/defaultdb?sslmode=disable)
+    # or at Postgres; everything except follower reads works on both.
+    SQLALCHEMY_DATABASE_URI = database_url(
+        os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URL)
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool per gunicorn worker: (DB_POOL_SIZE + DB_MAX_OVERFLOW) * workers
+    # must stay under the cluster's connection limit. Pre-ping and recycle
+    # drop connections the load balancer closed while they sat idle.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 5)),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+    }
+
+    # Serialization failures (SQLSTATE 40001) are retried this many times
+    # in total, backing off from DB_RETRY_BACKOFF seconds
+    DB_RETRY_ATTEMPTS = int(os.environ.get("DB_RETRY_ATTEMPTS", 5))
+    DB_RETRY_BACKOFF = float(os.environ.get("DB_RETRY_BACKOFF", 0.05))
+
+    # Run analytics reads AS OF SYSTEM TIME follower_read_timestamp()
+    # (CockroachDB only; ignored on Postgres). Reads may lag writes by a
+    # few seconds in exchange for being served by the nearest replica
+    # without contending with order writes.
+    ANALYTICS_FOLLOWER_READS = env_bool("ANALYTICS_FOLLOWER_READS")
+    # How far follower reads may lag, in seconds. For this long after an
+    # order write invalidates the analytics cache, cache misses read the
+    # current data instead so the write shows up in what gets cached.
+    FOLLOWER_READ_STALENESS = float(os.environ.get("FOLLOWER_READ_STALENESS", 10))
+
+    # Per-request SQL instrumentation. Requests slower than SLOW_REQUEST_MS
+    # (0 disables) are logged with their statements, for the given
+    # fraction of them.
+    SERVER_TIMING = env_bool("SERVER_TIMING", True)
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", 1000))
+    SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", 1.0))
+
+    # GET /metrics. With several gunicorn workers set METRICS_DIR to a
+    # directory private to this deployment (emptied on start); workers
+    # write their snapshots there and any worker can serve the total.
+    METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5))
+
+    # Rendered invoice files, shared by every worker on the host
+    INVOICE_CACHE_DIR = os.environ.get(
+        "INVOICE_CACHE_DIR",
+        os.path.join(tempfile.gettempdir(), "order-bkd-invoices")
+    )
+    INVOICE_CACHE_MAX_BYTES = int(
+        os.environ.get("INVOICE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+    )
+
+    # Background invoice exports (POST /api/v1/invoices/jobs). Each worker
+    # renders EXPORT_WORKERS jobs at a time and holds at most
+    # EXPORT_QUEUE_SIZE unfinished ones before answering 503. Results are
+    # kept in EXPORT_JOBS_DIR for EXPORT_JOB_TTL seconds; with several
+    # hosts it must be a shared volume.
+    EXPORT_JOBS_DIR = os.environ.get(
+        "EXPORT_JOBS_DIR",
+        os.path.join(tempfile.gettempdir(), "order-bkd-exports")
+    )
+    EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 2))
+    EXPORT_QUEUE_SIZE = int(os.environ.get("EXPORT_QUEUE_SIZE", 8))
+    EXPORT_RETRY_AFTER = int(os.environ.get("EXPORT_RETRY_AFTER", 5))
+    EXPORT_JOB_TTL = int(os.environ.get("EXPORT_JOB_TTL", 24 * 3600))
+    EXPORT_HEARTBEAT = float(os.environ.get("EXPORT_HEARTBEAT", 10))
+
+    # Processes rendering GET /api/v1/invoices/batch; 0 means one per CPU.
+    # One pool per gunicorn worker, shared by all of its batch requests.
+    BATCH_INVOICE_WORKERS = int(os.environ.get("BATCH_INVOICE_WORKERS", 0))
+
+    # Response compression (gzip; brotli/zstd when their packages are
+    # installed) for these mimetypes, above COMPRESSION_MIN_SIZE bytes.
+    # Compressed bodies of ETagged responses are cached per worker. PDFs
+    # are left out: their page streams are already Flate-compressed.
+    COMPRESSION_ENABLED = env_bool("COMPRESSION_ENABLED", True)
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+    COMPRESSION_MIMETYPES = os.environ.get(
+        "COMPRESSION_MIMETYPES",
+        "application/json,application/x-ndjson,text/plain,text/csv,text/html",
+    ).split(",")
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 5))
+    COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3))
+    COMPRESSION_CACHE_MAX_BYTES = int(
+        os.environ.get("COMPRESSION_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+    )
+
+    # JSON encoder for responses: auto (orjson if installed), orjson or stdlib
+    JSON_ENCODER = os.environ.get("JSON_ENCODER", "auto")
+
+    # Exact list totals cached per filter signature and table versions
+    COUNT_CACHE_TTL = int(os.environ.get("COUNT_CACHE_TTL", 300))
+    COUNT_CACHE_MAX_ENTRIES = int(os.environ.get("COUNT_CACHE_MAX_ENTRIES", 1024))
+
+    # Mixed into every ETag; change it (e.g. to the release id) when a
+    # deploy changes response formats so clients refetch
+    ETAG_SALT = os.environ.get("ETAG_SALT", "")
+
+    # Analytics response cache. Set the TTL to 0 to disable it; point the
+    # backend ("module:Class") at a shared store to share entries and
+    # invalidations between workers.
+    ANALYTICS_CACHE_TTL = int(os.environ.get("ANALYTICS_CACHE_TTL", 60))
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.environ.get("ANALYTICS_CACHE_MAX_ENTRIES", 512))
+    ANALYTICS_CACHE_BACKEND = os.environ.get("ANALYTICS_CACHE_BACKEND", "app.cache:MemoryBackend")
+
+    # POST /api/v1/orders/bulk
+    BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", 20000))
+    BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 500))
+    REPRICE_CHUNK_SIZE = int(os.environ.get("REPRICE_CHUNK_SIZE", 5000))
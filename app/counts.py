@@ -0,0 +1,167 @@
+"""
+Totals for paginated list endpoints without a COUNT(*) per request.
+
+- Unfiltered totals of orders and clients come from the row_counts
+  counters, maintained by every insert and delete.
+- Other exact totals are cached per normalized filter signature, keyed
+  by the table_versions of the tables involved, so any write to them
+  makes the next request count again.
+- ``?count=estimate`` asks the planner for its row estimate instead.
+"""
+import json
+import re
+
+from flask import current_app, g
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.cache import MemoryBackend
+from app.dimensions import table_versions
+from app.models import db, Client, Order, RowCount
+
+COUNTED_TABLES = {"orders": Order, "clients": Client}
+
+
+# ---- Maintained counters ----
+
+def adjust_row_count(name, delta):
+    """Add ``delta`` to a table's counter, in the current transaction."""
+    if delta:
+        db.session.execute(
+            update(RowCount).where(RowCount.name == name).values(count=RowCount.count + delta)
+        )
+
+
+def rebuild_row_counts():
+    """
+    Recount every counted table and store the counts. On Postgres the
+    tables are share-locked so no write slips between count and store;
+    CockroachDB's serializable transactions give the same guarantee.
+    Caller commits.
+    """
+    counts = {}
+    for name, model in COUNTED_TABLES.items():
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+        count = db.session.execute(select(func.count()).select_from(model)).scalar()
+        stmt = pg_insert(RowCount).values(name=name, count=count)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["name"], set_={"count": stmt.excluded.count},
+        ))
+        counts[name] = count
+    return counts
+
+
+def row_count(name):
+    """The maintained count of a table, or None before it has been seeded."""
+    return db.session.execute(
+        select(RowCount.count).where(RowCount.name == name)
+    ).scalar()
+
+
+# ---- Cached exact counts ----
+
+class CountCache:
+    def __init__(self, max_entries, ttl):
+        self.backend = MemoryBackend(max_entries)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value[0]
+
+    def set(self, key, count):
+        self.backend.set(key, count, {}, self.ttl)
+
+
+def get_count_cache():
+    cache = current_app.extensions.get("count_cache")
+    if cache is None:
+        cache = CountCache(
+            current_app.config["COUNT_CACHE_MAX_ENTRIES"],
+            current_app.config["COUNT_CACHE_TTL"],
+        )
+        current_app.extensions["count_cache"] = cache
+    return cache
+
+
+def _versions(names):
+    # Reuse the versions a conditional view already read this request
+    known = g.get("table_versions") or {}
+    if all(name in known for name in names):
+        return {name: known[name] for name in names}
+    return table_versions(names)
+
+
+# ---- Estimates ----
+
+_COCKROACH_ESTIMATE = re.compile(r"estimated row count: ([\d,]+)")
+
+
+def estimated_count(query):
+    """
+    The planner's row estimate for ``query``, or None if it has none.
+    Costs one EXPLAIN, which reads statistics but no rows.
+    """
+    stmt = query.order_by(None).statement
+    compiled = stmt.compile(
+        dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    connection = db.session.connection()
+
+    if db.engine.dialect.name == "cockroachdb":
+        for (line,) in connection.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params):
+            match = _COCKROACH_ESTIMATE.search(line)
+            if match:
+                return int(match.group(1).replace(",", ""))
+        return None
+
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+# ---- List totals ----
+
+def filter_signature(args, names):
+    """
+    The list filters in effect, in a fixed order. Values are kept verbatim
+    because the views filter on them verbatim; empty ones are not applied.
+    """
+    return tuple((name, args[name]) for name in sorted(names) if args.get(name))
+
+
+def list_total(query, table, signature, args, depends_on=()):
+    """
+    Total rows of the filtered list ``query`` over ``table``.
+
+    ``signature`` comes from ``filter_signature``; ``depends_on`` names
+    other tables the filters read (e.g. dimension names matched by a
+    search). Returns (total, estimated).
+    """
+    if args.get("count") == "estimate":
+        estimate = estimated_count(query)
+        if estimate is not None:
+            return estimate, True
+
+    if not signature and table in COUNTED_TABLES:
+        count = row_count(table)
+        if count is not None:
+            return count, False
+
+    tables = (table,) + tuple(depends_on)
+    versions = _versions(tables)
+    key = json.dumps([table, signature, sorted(versions.items())])
+    cache = get_count_cache()
+    count = cache.get(key)
+    if count is None:
+        count = query.order_by(None).count()
+        cache.set(key, count)
+    return count, False
@@ -0,0 +1,116 @@
+import threading
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models import db, Class, Genre, Product, TableVersion
+
+DIMENSION_TABLES = ("classes", "genres", "products")
+
+
+def bump_version(*names):
+    """Increment the write counter of each table, in the current transaction."""
+    for name in names:
+        stmt = pg_insert(TableVersion).values(name=name, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"version": TableVersion.version + 1},
+        )
+        db.session.execute(stmt)
+
+
+def table_versions(names):
+    rows = db.session.execute(
+        select(TableVersion.name, TableVersion.version)
+        .where(TableVersion.name.in_(names))
+    )
+    versions = dict.fromkeys(names, 0)
+    versions.update((name, version) for name, version in rows)
+    return versions
+
+
+class DimensionCache:
+    """
+    Per-worker copy of the small classes, genres and products tables.
+
+    Each table is reloaded only when its table_versions counter has moved.
+    The counters are checked at most once per request, with a single
+    indexed lookup.
+    """
+
+    def __init__(self):
+        self.versions = {}
+        self.classes = {}
+        self.genres = {}
+        self.products = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        if name == "classes":
+            self.classes = {
+                c.id: {"id": c.id, "name": c.name} for c in Class.query.all()
+            }
+        elif name == "genres":
+            self.genres = {
+                g.id: {"id": g.id, "name": g.name} for g in Genre.query.all()
+            }
+        elif name == "products":
+            self.products = {
+                p.id: {"id": p.id, "name": p.name, "pricePerUnit": p.pricePerUnit}
+                for p in Product.query.all()
+            }
+
+    def refresh(self):
+        if has_request_context():
+            if g.get("dimensions_checked"):
+                return
+            g.dimensions_checked = True
+
+        current = table_versions(DIMENSION_TABLES)
+        stale = [n for n in DIMENSION_TABLES if self.versions.get(n) != current[n]]
+        if not stale:
+            return
+
+        with self._lock:
+            for name in stale:
+                self._load(name)
+                self.versions[name] = current[name]
+
+    def get_class(self, class_id):
+        self.refresh()
+        return self.classes.get(class_id)
+
+    def get_genre(self, genre_id):
+        self.refresh()
+        return self.genres.get(genre_id)
+
+    def get_product(self, product_id):
+        self.refresh()
+        return self.products.get(product_id)
+
+    def all_classes(self):
+        self.refresh()
+        return list(self.classes.values())
+
+    def all_genres(self):
+        self.refresh()
+        return list(self.genres.values())
+
+
+def get_dimensions():
+    cache = current_app.extensions.get("dimensions")
+    if cache is None:
+        cache = DimensionCache()
+        current_app.extensions["dimensions"] = cache
+    return cache
+
+
+def dimensions_changed(*names):
+    """
+    Record a write to dimension tables. Call before committing; the bump
+    makes every worker (this one included) reload them on next use.
+    """
+    bump_version(*names)
+    if has_request_context():
+        g.pop("dimensions_checked", None)
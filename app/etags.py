@@ -0,0 +1,48 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+
+from app.dimensions import table_versions
+
+
+def view_etag(tables):
+    """
+    Strong ETag for the current GET: the write counters of every table the
+    view reads plus the path and query string, so it changes whenever any
+    of them does.
+    """
+    versions = table_versions(tables)
+    # List totals are cached under the same versions (see app.counts)
+    g.table_versions = versions
+    raw = "\x1f".join([
+        current_app.config["ETAG_SALT"],
+        request.path,
+        *(f"{k}={v}" for k, v in sorted(request.args.items(multi=True))),
+        *(f"{name}:{versions[name]}" for name in sorted(versions)),
+    ])
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def conditional(*tables):
+    """
+    Answer ``If-None-Match`` with 304 Not Modified when none of ``tables``
+    were written since the client's copy, before the view runs at all.
+    Costs one lookup in table_versions; successful responses get the ETag
+    and must be revalidated before reuse.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = view_etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
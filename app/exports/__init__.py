@@ -0,0 +1,48 @@
+"""
+Invoice export renderers.
+
+Each renderer consumes an iterator of invoice rows, as produced by
+``app.services.iter_invoice_rows``, and writes the finished document to a
+binary file object, so no renderer ever holds the whole order set in
+memory.
+
+Backends pull in openpyxl or reportlab, which are slow to import and
+unused by most requests, so they are only imported the first time a
+renderer is asked for.
+"""
+import importlib
+import threading
+
+# format -> "module:attribute"
+_REGISTRY = {
+    "excel": "app.exports.excel:write_invoice_excel",
+    "pdf": "app.exports.pdf:iter_invoice_pdf",
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def register_renderer(name, target):
+    """Register (or replace) a renderer given as ``"module:attribute"``."""
+    with _lock:
+        _REGISTRY[name] = target
+        _loaded.pop(name, None)
+
+
+def get_renderer(name):
+    renderer = _loaded.get(name)
+    if renderer is not None:
+        return renderer
+
+    with _lock:
+        renderer = _loaded.get(name)
+        if renderer is None:
+            try:
+                target = _REGISTRY[name]
+            except KeyError:
+                raise ValueError(f"Unknown export format: {name}")
+            module_name, attr = target.split(":")
+            renderer = getattr(importlib.import_module(module_name), attr)
+            _loaded[name] = renderer
+    return renderer
@@ -0,0 +1,59 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+INVOICE_HEADERS = [
+    "Product", "Pages/Slides", "Price Per Unit", "Total Cost",
+    "Week", "Genre", "Class", "Date",
+]
+
+_thin = Side(style="thin")
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=_thin, right=_thin, top=_thin, bottom=_thin)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+def _header(ws, values):
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+
+def write_invoice_excel(out, rows):
+    """
+    Write the Invoice and Summary sheets to ``out``.
+
+    Uses openpyxl's write-only mode: appended rows are spooled to a
+    temporary file rather than kept as cell objects, so memory stays flat
+    however many orders the invoice covers. Returns the invoice total.
+    """
+    wb = Workbook(write_only=True)
+
+    ws = wb.create_sheet("Invoice")
+    ws.append(_header(ws, INVOICE_HEADERS))
+
+    total = 0.0
+    for product, pages, price, cost, week, genre, order_class, created_at in rows:
+        ws.append([
+            product,
+            pages,
+            price,
+            cost,
+            week,
+            genre,
+            order_class,
+            created_at.strftime("%Y-%m-%d"),
+        ])
+        total += cost
+
+    summary = wb.create_sheet("Summary")
+    summary.append(_header(summary, ["Total Amount"]))
+    summary.append([total])
+
+    wb.save(out)
+    return total
@@ -0,0 +1,250 @@
+import zlib
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 50
+ROW_HEIGHT = 18
+CELL_PADDING = 4
+
+FONT = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+FONT_SIZE = 10
+
+# (header, width, right-aligned)
+INVOICE_COLUMNS = [
+    ("Date", 80, False),
+    ("Product", 215, False),
+    ("Pages/Slides", 70, True),
+    ("Price/Unit", 65, True),
+    ("Total Cost", 65, True),
+]
+
+# Resource names of the two standard fonts every page uses
+_FONT_RESOURCES = {FONT: "F1", FONT_BOLD: "F2"}
+
+
+def _pdf_string(text):
+    raw = text.encode("cp1252", errors="replace")
+    raw = raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + raw + b")"
+
+
+@lru_cache(maxsize=4096)
+def fit_text(text, font, size, width):
+    """Truncate ``text`` with an ellipsis so it fits in ``width`` points."""
+    if stringWidth(text, font, size) <= width:
+        return text
+
+    # Longest prefix that still fits once the ellipsis is appended
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if stringWidth(text[:mid] + "...", font, size) <= width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + "..."
+
+
+class PageCanvas:
+    """Collects the content stream operators for one page."""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, value, font=FONT, size=FONT_SIZE):
+        self.ops.append(
+            b"BT /%s %d Tf %.2f %.2f Td %s Tj ET"
+            % (_FONT_RESOURCES[font].encode(), size, x, y, _pdf_string(value))
+        )
+
+    def cell(self, x, y, width, value, font=FONT, right=False):
+        value = fit_text(value, font, FONT_SIZE, width - 2 * CELL_PADDING)
+        if right:
+            x += width - CELL_PADDING - stringWidth(value, font, FONT_SIZE)
+        else:
+            x += CELL_PADDING
+        self.text(x, y + 5, value, font)
+
+    def rect(self, x, y, width, height, fill=None):
+        if fill is not None:
+            self.ops.append(b"q %.2f g %.2f %.2f %.2f %.2f re f Q" % (fill, x, y, width, height))
+        self.ops.append(b"%.2f %.2f %.2f %.2f re S" % (x, y, width, height))
+
+    def render(self):
+        return b"0.5 w\n" + b"\n".join(self.ops)
+
+
+class StreamingPDF:
+    """
+    Minimal incremental PDF writer.
+
+    Each finished page is serialized immediately and handed back as bytes;
+    only the object offsets are remembered until ``close()`` writes the
+    page tree and cross-reference table. Memory therefore does not grow
+    with the number of pages beyond a few integers per page.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3
+        self.font_ids = {}
+
+    def _alloc(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _obj(self, obj_id, body):
+        self.offsets[obj_id] = self.offset
+        data = b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+        self.offset += len(data)
+        return data
+
+    def begin(self):
+        data = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offset += len(data)
+
+        for font in _FONT_RESOURCES:
+            obj_id = self._alloc()
+            self.font_ids[font] = obj_id
+            data += self._obj(
+                obj_id,
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /%s"
+                b" /Encoding /WinAnsiEncoding >>" % font.encode()
+            )
+        return data
+
+    def page(self, canvas):
+        content = zlib.compress(canvas.render())
+        content_id = self._alloc()
+        page_id = self._alloc()
+        self.page_ids.append(page_id)
+
+        fonts = b" ".join(
+            b"/%s %d 0 R" % (name.encode(), self.font_ids[font])
+            for font, name in _FONT_RESOURCES.items()
+        )
+
+        data = self._obj(
+            content_id,
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content)
+            + content + b"\nendstream"
+        )
+        data += self._obj(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f]"
+            b" /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+            % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, fonts, content_id)
+        )
+        return data
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % i for i in self.page_ids)
+        data = self._obj(
+            self.PAGES,
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids))
+        )
+        data += self._obj(self.CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES)
+
+        xref_offset = self.offset
+        size = self.next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            xref.append(b"%010d 00000 n \n" % self.offsets[obj_id])
+        data += b"".join(xref)
+        data += (
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, self.CATALOG, xref_offset)
+        )
+        return data
+
+
+def _table_header(canvas, y):
+    x = MARGIN
+    for title, width, right in INVOICE_COLUMNS:
+        canvas.rect(x, y, width, ROW_HEIGHT, fill=0.85)
+        canvas.cell(x, y, width, title, FONT_BOLD, right)
+        x += width
+
+
+def _table_row(canvas, y, values):
+    x = MARGIN
+    for value, (_, width, right) in zip(values, INVOICE_COLUMNS):
+        canvas.rect(x, y, width, ROW_HEIGHT)
+        canvas.cell(x, y, width, value, FONT, right)
+        x += width
+
+
+def iter_invoice_pdf(invoice, rows):
+    """
+    Render an invoice as a sequence of PDF byte chunks, one per page.
+
+    ``invoice`` carries the heading (``clientName``, ``institution``,
+    ``startDate``, ``endDate``); ``rows`` is an iterator of invoice rows as
+    produced by ``iter_invoice_rows``. Every page repeats the table header
+    and is emitted as soon as it is full, so the first bytes go out after
+    the first page and memory does not depend on the invoice length.
+    """
+    pdf = StreamingPDF()
+    yield pdf.begin()
+
+    rows = iter(rows)
+    row = next(rows, None)
+    total = 0.0
+    page_number = 0
+
+    # A new page is only started while a row is still waiting for one
+    while True:
+        page_number += 1
+        canvas = PageCanvas()
+        y = PAGE_HEIGHT - MARGIN
+
+        if page_number == 1:
+            canvas.text(MARGIN, y - 16, f"Invoice for {invoice['clientName']}", FONT_BOLD, 16)
+            y -= 40
+            canvas.text(MARGIN, y, f"Institution: {invoice['institution']}", FONT, 12)
+            y -= 20
+            canvas.text(
+                MARGIN, y,
+                f"Period: {invoice['startDate'].date()} - {invoice['endDate'].date()}",
+                FONT, 12
+            )
+            y -= 30
+
+        y -= ROW_HEIGHT
+        _table_header(canvas, y)
+
+        while row is not None and y - ROW_HEIGHT >= MARGIN + ROW_HEIGHT:
+            product, pages, price, cost, _, _, _, created_at = row
+            y -= ROW_HEIGHT
+            _table_row(canvas, y, [
+                created_at.strftime("%Y-%m-%d"),
+                product,
+                str(pages),
+                f"{price:.2f}",
+                f"{cost:.2f}",
+            ])
+            total += cost
+            row = next(rows, None)
+
+        if row is None:
+            # Rows stop a row height above the margin, so the total always
+            # fits above the page number
+            canvas.text(MARGIN, y - 2 * ROW_HEIGHT, f"Total Amount: {total:.2f}", FONT_BOLD, 12)
+
+        canvas.text(MARGIN, MARGIN - 30, f"Page {page_number}", FONT, 8)
+        yield pdf.page(canvas)
+        if row is None:
+            break
+
+    yield pdf.close()
+
@@ -0,0 +1,108 @@
+import random
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements kept per request for the slow-request log
+MAX_LOGGED_STATEMENTS = 50
+
+
+class RequestStats:
+    """SQL activity of one request, filled in by the engine event hooks."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.statements = []
+
+    def record(self, statement, elapsed, rowcount):
+        self.queries += 1
+        self.db_time += elapsed
+        if rowcount > 0:
+            self.rows += rowcount
+        if len(self.statements) < MAX_LOGGED_STATEMENTS:
+            self.statements.append((elapsed, statement))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_stats():
+    """The RequestStats of the current request, or None outside one."""
+    if has_request_context():
+        return g.get("sql_stats")
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started, cursor.rowcount)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+def _start_request():
+    g.sql_stats = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+
+    total_ms = stats.elapsed() * 1000
+    db_ms = stats.db_time * 1000
+
+    if current_app.config["SERVER_TIMING"]:
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={db_ms:.1f};desc="{stats.queries} queries, {stats.rows} rows"'
+            f", app;dur={total_ms - db_ms:.1f}, total;dur={total_ms:.1f}"
+        )
+
+    threshold = current_app.config["SLOW_REQUEST_MS"]
+    if (
+        threshold
+        and total_ms >= threshold
+        and random.random() < current_app.config["SLOW_REQUEST_SAMPLE_RATE"]
+    ):
+        statements = "\n".join(
+            f"  [{elapsed * 1000:.1f}ms] {' '.join(statement.split())}"
+            for elapsed, statement in stats.statements
+        )
+        current_app.logger.warning(
+            "Slow request %s %s: %.1fms total, %.1fms in %d queries, %d rows\n%s",
+            request.method, request.full_path.rstrip("?"), total_ms, db_ms,
+            stats.queries, stats.rows, statements,
+        )
+
+    return response
+
+
+def init_instrumentation(app):
+    """
+    Count queries, DB time and rows for every request and report them in
+    a Server-Timing header; requests slower than SLOW_REQUEST_MS are
+    logged with their statements (sampled by SLOW_REQUEST_SAMPLE_RATE).
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,166 @@
+"""
+Month-end batch invoicing: every client's invoice for a period in one ZIP.
+
+All orders of the period are read in a single query ordered by client and
+split into per-client row lists as they stream in. Each client's invoice
+is rendered in a process pool, since rendering is CPU bound and would
+otherwise serialise on the GIL, and written into the ZIP as soon as it
+completes, so the archive streams out while later clients still render.
+The pool is shared by every batch a worker process serves, so concurrent
+batches queue for the same render processes.
+"""
+import io
+import itertools
+import multiprocessing
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+from app import metrics
+from app.exports import get_renderer
+from app.services import iter_period_invoice_rows
+
+FORMATS = {"excel": "xlsx", "pdf": "pdf"}
+
+# Invoices queued per pool process; bounds how many clients' rows are
+# held in memory at once
+QUEUE_PER_WORKER = 2
+
+
+def render_invoice(fmt, heading, rows):
+    """Render one invoice in a pool process. Returns (bytes, seconds)."""
+    started = time.perf_counter()
+    if fmt == "excel":
+        out = io.BytesIO()
+        get_renderer("excel")(out, rows)
+        data = out.getvalue()
+    else:
+        data = b"".join(get_renderer("pdf")(heading, rows))
+    return data, time.perf_counter() - started
+
+
+class _ZipSink:
+    """Unseekable file for ZipFile that hands over whatever was written so far."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def entry_name(client_name, client_id, ext):
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", client_name or "").strip("_") or "client"
+    return f"{safe}_{client_id[:8]}.{ext}"
+
+
+def iter_client_invoices(start_date, end_date):
+    """Yield (clientId, heading, rows) for each client with orders in the period."""
+    rows = iter_period_invoice_rows(start_date, end_date)
+    for client_id, group in itertools.groupby(rows, key=lambda r: r[0]):
+        first = next(group)
+        heading = {
+            "clientName": first[1],
+            "institution": first[2],
+            "startDate": start_date,
+            "endDate": end_date,
+        }
+        yield client_id, heading, [first[3]] + [r[3] for r in group]
+
+
+class RenderPool:
+    def __init__(self, workers):
+        self.workers = workers
+        self.pid = os.getpid()
+        # spawn rather than fork: the parent holds open database connections
+        # and background threads that a forked child must not inherit
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+
+def get_render_pool(app=None):
+    """
+    The invoice render pool of this process, started on first use with
+    BATCH_INVOICE_WORKERS processes (0 means one per CPU).
+    """
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get("invoice_render_pool")
+    # A pool inherited through fork has no processes; start a fresh one
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            pool = app.extensions.get("invoice_render_pool")
+            if pool is None or pool.pid != os.getpid():
+                workers = app.config["BATCH_INVOICE_WORKERS"] or os.cpu_count() or 1
+                pool = RenderPool(workers)
+                app.extensions["invoice_render_pool"] = pool
+    return pool
+
+
+def discard_render_pool(pool, app=None):
+    """Drop a pool whose processes died so the next batch starts a new one."""
+    app = app or current_app._get_current_object()
+    with _pool_lock:
+        if app.extensions.get("invoice_render_pool") is pool:
+            del app.extensions["invoice_render_pool"]
+    pool.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool_lock = threading.Lock()
+
+
+def iter_invoice_zip(start_date, end_date, fmt):
+    """
+    Yield a ZIP archive with one ``fmt`` invoice per client as byte
+    chunks, entries in the order their renders finish.
+    """
+    ext = FORMATS[fmt]
+    pool = get_render_pool()
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, "w")
+    pending = {}
+
+    def write_finished():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            data, seconds = future.result()
+            metrics.observe("export_render_seconds", seconds, {"format": fmt})
+            # xlsx files are zip archives and the PDF page content streams
+            # are deflated by the renderer; compressing again gains nothing
+            archive.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+        return sink.take()
+
+    try:
+        for client_id, heading, rows in iter_client_invoices(start_date, end_date):
+            if len(pending) >= pool.workers * QUEUE_PER_WORKER:
+                yield write_finished()
+            future = pool.executor.submit(render_invoice, fmt, heading, rows)
+            pending[future] = entry_name(heading["clientName"], client_id, ext)
+
+        while pending:
+            yield write_finished()
+        archive.close()
+        yield sink.take()
+    except BrokenProcessPool:
+        discard_render_pool(pool)
+        raise
+    finally:
+        # Only this batch's renders; other batches share the pool
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.models import db, Client, Order, Product
+
+
+def invoice_data_version(client_id, start_date, end_date):
+    """
+    Cheap fingerprint of everything a rendered invoice depends on: the
+    number of matching orders and the latest change to them, their
+    products and the client. Any edit, insert or delete in the range
+    changes it.
+    """
+    client_updated = (
+        db.session.query(Client.updatedAt)
+        .filter(Client.id == client_id)
+        .scalar_subquery()
+    )
+
+    row = (
+        db.session.query(
+            func.count(Order.id),
+            func.max(Order.updatedAt),
+            func.max(Product.updatedAt),
+            client_updated,
+        )
+        .join(Product, Product.id == Order.productId)
+        .filter(
+            Order.clientId == client_id,
+            Order.createdAt >= start_date,
+            Order.createdAt <= end_date,
+        )
+        .one()
+    )
+
+    return ":".join(
+        v.isoformat() if hasattr(v, "isoformat") else str(v)
+        for v in row
+    )
+
+
+class InvoiceCache:
+    """
+    Content-addressed, size-bounded store for rendered invoice files.
+
+    Entries live as ``<sha256>.<ext>`` in one directory shared by all
+    workers on the host. A file's mtime doubles as its last-access time,
+    so eviction drops the least recently downloaded artifacts first.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        raw = "\x1f".join(str(p) for p in parts)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path(self, key, ext):
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def open(self, key, ext):
+        """
+        Return an open file for a cached artifact, or None on a miss.
+        The handle stays valid even if another worker evicts the entry.
+        """
+        path = self.path(key, ext)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return f
+
+    def store(self, key, ext, write):
+        """
+        Render straight into the cache: ``write`` receives a binary file
+        in the cache directory, which is moved into place once complete.
+        Returns that file open for reading, so it stays readable even if
+        eviction (this one or another worker's) removes the entry.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        out = os.fdopen(fd, "w+b")
+        try:
+            write(out)
+            out.flush()
+            os.replace(tmp, self.path(key, ext))
+        except BaseException:
+            out.close()
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        out.seek(0)
+        self.evict()
+        return out
+
+    def stream_store(self, key, ext, chunks):
+        """
+        Pass ``chunks`` through to the caller while writing them to the
+        cache. The entry only becomes visible once every chunk has been
+        written; an aborted download leaves nothing behind.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    yield chunk
+            os.replace(tmp, self.path(key, ext))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def get_invoice_cache():
+    cache = current_app.extensions.get("invoice_cache")
+    if cache is None:
+        cache = InvoiceCache(
+            current_app.config["INVOICE_CACHE_DIR"],
+            current_app.config["INVOICE_CACHE_MAX_BYTES"],
+        )
+        current_app.extensions["invoice_cache"] = cache
+    return cache
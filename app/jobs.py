@@ -0,0 +1,355 @@
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.invoice_cache import invoice_data_version
+from app.models import db, ExportJob
+from app.services import generate_invoice_excel, generate_invoice_pdf
+from app.transactions import run_in_transaction
+
+FORMATS = {
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf", "application/pdf"),
+}
+
+ACTIVE = ("queued", "running")
+
+
+class QueueFull(Exception):
+    """This worker already holds EXPORT_QUEUE_SIZE unfinished jobs."""
+
+
+def dedup_key(fmt, client_id, start_date, end_date, version):
+    raw = "|".join((fmt, client_id, start_date.isoformat(), end_date.isoformat(), version))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def job_to_dict(job):
+    return {
+        "id": job.id,
+        "format": job.format,
+        "clientId": job.clientId,
+        "startDate": job.startDate.isoformat(),
+        "endDate": job.endDate.isoformat(),
+        "status": job.status,
+        "rowsDone": job.rowsDone,
+        "rowsTotal": job.rowsTotal,
+        "error": job.error,
+        "resultSize": job.resultSize,
+        "createdAt": job.createdAt.isoformat() if job.createdAt else None,
+        "startedAt": job.startedAt.isoformat() if job.startedAt else None,
+        "finishedAt": job.finishedAt.isoformat() if job.finishedAt else None,
+    }
+
+
+class ExportJobRunner:
+    """
+    Renders invoice exports on a bounded thread pool, outside the request.
+
+    Jobs live in the export_jobs table, so any worker can report on them
+    and a job whose worker died (no heartbeat for three intervals) is
+    picked up again by whichever worker next sees it. Each worker accepts
+    at most EXPORT_QUEUE_SIZE unfinished jobs; beyond that ``reserve``
+    raises QueueFull and the caller should ask the client to retry.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        # pids repeat across container restarts; the suffix keeps ids unique
+        self.worker_id = f"{socket.gethostname()}:{self.pid}:{uuid.uuid4().hex[:8]}"
+        self.directory = app.config["EXPORT_JOBS_DIR"]
+        self.capacity = app.config["EXPORT_QUEUE_SIZE"]
+        self.heartbeat = app.config["EXPORT_HEARTBEAT"]
+        self.ttl = app.config["EXPORT_JOB_TTL"]
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config["EXPORT_WORKERS"], thread_name_prefix="export-job"
+        )
+        self.outstanding = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._stop = threading.Event()
+        self._beat_thread = threading.Thread(
+            target=self._beat_loop, name="export-job-heartbeat", daemon=True
+        )
+        self._beat_thread.start()
+
+    # ---- Capacity ----
+
+    def reserve(self):
+        with self.lock:
+            if self.outstanding >= self.capacity:
+                raise QueueFull()
+            self.outstanding += 1
+
+    def release(self):
+        with self.lock:
+            self.outstanding -= 1
+
+    def start(self, job_id):
+        """Run a job on the pool; the caller must hold a reservation."""
+        self.executor.submit(self._run, job_id)
+
+    # ---- Submission ----
+
+    def submit(self, fmt, client_id, start_date, end_date):
+        """
+        Return ``(job, created)`` for an export with these parameters,
+        reusing the existing job when the same export of the same data
+        is queued, running or finished. Raises QueueFull.
+        """
+        version = invoice_data_version(client_id, start_date, end_date)
+        key = dedup_key(fmt, client_id, start_date, end_date, version)
+        rows_total = int(version.split(":", 1)[0])
+
+        job = db.session.execute(select(ExportJob).filter_by(dedupKey=key)).scalar_one_or_none()
+        if job is not None and self._reusable(job):
+            return job, False
+
+        self.reserve()
+        try:
+            if job is None:
+                job, inserted = self._insert(key, fmt, client_id, start_date, end_date, rows_total)
+                if not inserted:
+                    # Another request inserted the same job first
+                    if self._reusable(job):
+                        self.release()
+                        return job, False
+                    job = self._requeue(job)
+            else:
+                job = self._requeue(job)
+        except BaseException:
+            self.release()
+            raise
+
+        if job is None:
+            # Lost the race to requeue it to another worker
+            self.release()
+            return db.session.execute(select(ExportJob).filter_by(dedupKey=key)).scalar_one(), False
+
+        self.start(job.id)
+        return job, True
+
+    def _reusable(self, job):
+        if job.status == "done":
+            return job.resultPath is not None and os.path.exists(job.resultPath)
+        if job.status in ACTIVE:
+            self.recover(job)
+            return True
+        return False
+
+    def _insert(self, key, fmt, client_id, start_date, end_date, rows_total):
+        def insert():
+            job = ExportJob(
+                dedupKey=key, format=fmt, clientId=client_id,
+                startDate=start_date, endDate=end_date, rowsTotal=rows_total,
+                workerId=self.worker_id, heartbeatAt=datetime.utcnow(),
+            )
+            db.session.add(job)
+            db.session.flush()
+            return job.id
+
+        try:
+            job_id = run_in_transaction(insert)
+        except IntegrityError:
+            return db.session.execute(select(ExportJob).filter_by(dedupKey=key)).scalar_one(), False
+        return db.session.get(ExportJob, job_id), True
+
+    def _requeue(self, job):
+        """
+        Take over a failed, expired or abandoned job and queue it here.
+        Returns None when another worker changed it first.
+        """
+        def claim(job_id, status, heartbeat):
+            return db.session.execute(
+                update(ExportJob)
+                .where(
+                    ExportJob.id == job_id,
+                    ExportJob.status == status,
+                    ExportJob.heartbeatAt.is_(None) if heartbeat is None
+                    else ExportJob.heartbeatAt == heartbeat,
+                )
+                .values(
+                    status="queued", rowsDone=0, error=None, resultPath=None,
+                    resultSize=None, workerId=self.worker_id,
+                    heartbeatAt=datetime.utcnow(), startedAt=None, finishedAt=None,
+                )
+            ).rowcount
+
+        claimed = run_in_transaction(claim, job.id, job.status, job.heartbeatAt)
+        db.session.expire(job)
+        return job if claimed else None
+
+    # ---- Recovery ----
+
+    def is_stale(self, job):
+        return (
+            job.status in ACTIVE
+            and job.workerId != self.worker_id
+            and (
+                job.heartbeatAt is None
+                or job.heartbeatAt < datetime.utcnow() - timedelta(seconds=3 * self.heartbeat)
+            )
+        )
+
+    def recover(self, job):
+        """Requeue ``job`` here if its worker stopped heartbeating and there is room."""
+        if not self.is_stale(job):
+            return False
+        try:
+            self.reserve()
+        except QueueFull:
+            return False
+        previous = job.workerId
+        if self._requeue(job) is None:
+            self.release()
+            return False
+        current_app.logger.warning("Recovered export job %s from %s", job.id, previous)
+        self.start(job.id)
+        return True
+
+    # ---- Rendering ----
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            try:
+                self._render(job_id)
+            except Exception as e:
+                current_app.logger.exception("Export job %s failed", job_id)
+                self._set(job_id, status="failed", error=str(e)[:500], finishedAt=datetime.utcnow())
+            finally:
+                db.session.remove()
+                self.release()
+
+    def _set(self, job_id, **values):
+        # Own connection: the render session is streaming a server-side
+        # cursor and must not be committed underneath it
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id, ExportJob.workerId == self.worker_id)
+                .values(**values)
+            )
+
+    def _render(self, job_id):
+        job = db.session.get(ExportJob, job_id)
+        if job is None or job.status != "queued" or job.workerId != self.worker_id:
+            return
+        fmt, client_id, start_date, end_date = job.format, job.clientId, job.startDate, job.endDate
+        ext, _ = FORMATS[fmt]
+        db.session.rollback()
+
+        self._set(job_id, status="running", startedAt=datetime.utcnow(), heartbeatAt=datetime.utcnow())
+
+        def progress(rows):
+            self._set(job_id, rowsDone=rows)
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=f".{ext}.tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if fmt == "excel":
+                    generate_invoice_excel(out, client_id, start_date, end_date, progress=progress)
+                else:
+                    for chunk in generate_invoice_pdf(client_id, start_date, end_date, progress=progress):
+                        out.write(chunk)
+            path = os.path.join(self.directory, f"{job_id}.{ext}")
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        self._set(
+            job_id, status="done", resultPath=path, resultSize=os.path.getsize(path),
+            finishedAt=datetime.utcnow(),
+        )
+
+    # ---- Housekeeping ----
+
+    def _beat_loop(self):
+        while not self._stop.wait(self.heartbeat):
+            with self.app.app_context():
+                try:
+                    self.beat()
+                    self.sweep()
+                except Exception:
+                    current_app.logger.exception("Export job heartbeat failed")
+                finally:
+                    db.session.remove()
+
+    def beat(self):
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(ExportJob)
+                .where(ExportJob.workerId == self.worker_id, ExportJob.status.in_(ACTIVE))
+                .values(heartbeatAt=datetime.utcnow())
+            )
+
+    def sweep(self):
+        """Recover abandoned jobs and delete finished ones older than EXPORT_JOB_TTL."""
+        stale_before = datetime.utcnow() - timedelta(seconds=3 * self.heartbeat)
+        abandoned = db.session.execute(
+            select(ExportJob)
+            .where(
+                ExportJob.status.in_(ACTIVE),
+                or_(ExportJob.heartbeatAt.is_(None), ExportJob.heartbeatAt < stale_before),
+            )
+            .limit(self.capacity)
+        ).scalars().all()
+        for job in abandoned:
+            self.recover(job)
+
+        expired = db.session.execute(
+            select(ExportJob.id, ExportJob.resultPath)
+            .where(ExportJob.finishedAt < datetime.utcnow() - timedelta(seconds=self.ttl))
+        ).all()
+        for job_id, path in expired:
+            if path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            run_in_transaction(
+                db.session.execute, delete(ExportJob).where(ExportJob.id == job_id)
+            )
+
+        # Partial files left by a worker that died mid-render
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp") and os.path.getmtime(path) < cutoff:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self):
+        self._stop.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_job_runner(app=None):
+    """The export job runner of this process, started on first use."""
+    app = app or current_app._get_current_object()
+    runner = app.extensions.get("export_jobs")
+    # A runner inherited through fork has no threads; start a fresh one
+    if runner is None or runner.pid != os.getpid():
+        with _runner_lock:
+            runner = app.extensions.get("export_jobs")
+            if runner is None or runner.pid != os.getpid():
+                runner = ExportJobRunner(app)
+                app.extensions["export_jobs"] = runner
+    return runner
+
+
+_runner_lock = threading.Lock()
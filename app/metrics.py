@@ -0,0 +1,411 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+
+from app.instrumentation import current_stats
+from app.models import db
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# name -> (type, help). Only names listed here are exported.
+METRICS = {
+    "http_requests_total": (
+        "counter", "Requests served, by blueprint, route, method and status."),
+    "http_request_duration_seconds": (
+        "histogram", "Time to produce the response, by blueprint, route and method."),
+    "http_request_db_seconds_total": (
+        "counter", "Time spent in SQL statements, by blueprint and route."),
+    "http_request_db_queries_total": (
+        "counter", "SQL statements executed, by blueprint and route."),
+    "export_render_seconds": (
+        "histogram", "Time to render an export file, by format."),
+    "db_pool_size": ("gauge", "Configured connections per worker pool."),
+    "db_pool_checked_out": ("gauge", "Connections currently in use."),
+    "db_pool_overflow": ("gauge", "Connections open beyond the pool size."),
+    "db_pool_capacity": ("gauge", "Pool size plus max overflow."),
+    "db_pool_utilisation": ("gauge", "Checked-out connections / (pool size + max overflow)."),
+    "cache_hits_total": ("counter", "Cache hits, by cache."),
+    "cache_misses_total": ("counter", "Cache misses, by cache."),
+    "cache_hit_ratio": ("gauge", "hits / (hits + misses), by cache."),
+}
+
+
+class _Shard:
+    """Values written by one thread; its lock is only shared with scrapes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+
+class Registry:
+    """
+    In-process metric store.
+
+    Every thread writes to its own shard, so request threads never wait
+    on each other; a scrape merges the shards. Gauges are not stored but
+    read from collectors at scrape time.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.collectors = []
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _labels(labels))
+        shard = self._shard()
+        with shard.lock:
+            shard.counters[key] = shard.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = (name, _labels(labels))
+        shard = self._shard()
+        with shard.lock:
+            hist = shard.histograms.get(key)
+            if hist is None:
+                hist = shard.histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(self.buckets)] += 1
+            hist[-1] += value
+
+    def snapshot(self):
+        """
+        Plain-data view of this process: counters and histograms summed
+        over all threads, plus the current collector values.
+        """
+        counters, histograms = {}, {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            with shard.lock:
+                for key, value in shard.counters.items():
+                    counters[key] = counters.get(key, 0) + value
+                for key, hist in shard.histograms.items():
+                    _add_hist(histograms, key, hist)
+
+        gauges = {}
+        for collect in self.collectors:
+            for kind, name, labels, value in collect():
+                key = (name, _labels(labels))
+                if kind == "counter":
+                    counters[key] = counters.get(key, 0) + value
+                else:
+                    gauges[key] = gauges.get(key, 0) + value
+
+        return {
+            "pid": os.getpid(),
+            "counters": [[n, l, v] for (n, l), v in counters.items()],
+            "histograms": [[n, l, h] for (n, l), h in histograms.items()],
+            "gauges": [[n, l, v] for (n, l), v in gauges.items()],
+        }
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _add_hist(target, key, hist):
+    current = target.get(key)
+    if current is None:
+        target[key] = list(hist)
+    else:
+        for i, value in enumerate(hist):
+            current[i] += value
+
+
+# ---- Multiprocess mode ----
+# With METRICS_DIR set, every worker writes its snapshot to
+# <dir>/metrics-<pid>.json (at most every METRICS_FLUSH_INTERVAL seconds,
+# and at every scrape it serves). A scrape merges all files: counters and
+# histograms of exited workers still count, gauges only for live ones.
+# Empty the directory when the gunicorn master starts.
+
+def write_snapshot(directory, snapshot):
+    path = os.path.join(directory, f"metrics-{snapshot['pid']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots(directory):
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # Vanished or half-written by a crashed worker
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    counters, histograms, gauges = {}, {}, {}
+    for snap in snapshots:
+        live = snap["pid"] == os.getpid() or _pid_alive(snap["pid"])
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap["histograms"]:
+            _add_hist(histograms, (name, tuple(map(tuple, labels))), hist)
+        if live:
+            for name, labels, value in snap["gauges"]:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+
+# ---- Exposition ----
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_text(counters, histograms, gauges, buckets=DEFAULT_BUCKETS):
+    """Prometheus text exposition format (version 0.0.4)."""
+    # Ratios are derived after merging so they cover every worker
+    capacity = gauges.get(("db_pool_capacity", ()))
+    if capacity:
+        gauges[("db_pool_utilisation", ())] = (
+            gauges.get(("db_pool_checked_out", ()), 0) / capacity
+        )
+    for (name, labels), hits in list(counters.items()):
+        if name == "cache_hits_total":
+            misses = counters.get(("cache_misses_total", labels), 0)
+            lookups = hits + misses
+            gauges[("cache_hit_ratio", labels)] = hits / lookups if lookups else 0.0
+
+    by_name = {}
+    for source in (counters, gauges):
+        for (name, labels), value in source.items():
+            by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), hist in histograms.items():
+        by_name.setdefault(name, []).append((labels, hist))
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        samples = by_name.get(name)
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(samples, key=lambda s: s[0]):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}"
+                )
+            cumulative += value[len(buckets)]
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {cumulative}')
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ---- Flask integration ----
+
+def get_registry(app=None):
+    app = app or current_app
+    return app.extensions["metrics"]
+
+
+def inc(name, labels=None, value=1):
+    registry = current_app.extensions.get("metrics")
+    if registry is not None:
+        registry.inc(name, labels, value)
+
+
+def observe(name, value, labels=None):
+    registry = current_app.extensions.get("metrics")
+    if registry is not None:
+        registry.observe(name, value, labels)
+
+
+@contextmanager
+def timer(name, labels=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, labels)
+
+
+def timed_chunks(name, chunks, labels=None):
+    """Pass ``chunks`` through, observing the time until it is exhausted."""
+    registry = current_app.extensions.get("metrics")
+    if registry is None:
+        return chunks
+
+    def timed():
+        started = time.perf_counter()
+        yield from chunks
+        registry.observe(name, time.perf_counter() - started, labels)
+    return timed()
+
+
+def render_metrics(app=None):
+    app = app or current_app
+    registry = get_registry(app)
+    snapshot = registry.snapshot()
+
+    directory = app.config["METRICS_DIR"]
+    if directory:
+        write_snapshot(directory, snapshot)
+        snapshots = read_snapshots(directory)
+    else:
+        snapshots = [snapshot]
+
+    return render_text(*merge_snapshots(snapshots), buckets=registry.buckets)
+
+
+def _pool_collector(app):
+    def collect():
+        with app.app_context():
+            pool = db.engine.pool
+        if not hasattr(pool, "checkedout"):
+            return []
+        size = pool.size()
+        capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+        return [
+            ("gauge", "db_pool_size", None, size),
+            ("gauge", "db_pool_checked_out", None, pool.checkedout()),
+            ("gauge", "db_pool_overflow", None, max(pool.overflow(), 0)),
+            ("gauge", "db_pool_capacity", None, capacity),
+        ]
+    return collect
+
+
+def _cache_collector(app):
+    def collect():
+        samples = []
+        for name in ("response_cache", "invoice_cache", "compression_cache", "count_cache"):
+            cache = app.extensions.get(name)
+            if cache is None:
+                continue
+            labels = {"cache": name}
+            samples.append(("counter", "cache_hits_total", labels, cache.hits))
+            samples.append(("counter", "cache_misses_total", labels, cache.misses))
+        return samples
+    return collect
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop("metrics_started", None)
+    registry = current_app.extensions.get("metrics")
+    if started is None or registry is None:
+        return response
+
+    labels = {
+        "blueprint": request.blueprint or "",
+        "route": request.url_rule.rule if request.url_rule else "unmatched",
+        "method": request.method,
+    }
+    registry.observe("http_request_duration_seconds", time.perf_counter() - started, labels)
+    registry.inc("http_requests_total", dict(labels, status=str(response.status_code)))
+
+    stats = current_stats()
+    if stats is not None:
+        db_labels = {"blueprint": labels["blueprint"], "route": labels["route"]}
+        registry.inc("http_request_db_seconds_total", db_labels, stats.db_time)
+        registry.inc("http_request_db_queries_total", db_labels, stats.queries)
+
+    directory = current_app.config["METRICS_DIR"]
+    if directory:
+        _maybe_flush(registry, directory, current_app.config["METRICS_FLUSH_INTERVAL"])
+    return response
+
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _maybe_flush(registry, directory, interval):
+    global _last_flush
+    if time.monotonic() - _last_flush < interval:
+        return
+    # One thread per process flushes; the others carry on
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        write_snapshot(directory, registry.snapshot())
+    except OSError:
+        current_app.logger.exception("Could not write metrics snapshot")
+    finally:
+        _flush_lock.release()
+
+
+def init_metrics(app):
+    """
+    Collect request, pool, cache and export metrics for GET /metrics.
+    Register after init_instrumentation so the request's SQL stats are
+    still available when its after_request hook runs.
+    """
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    registry = Registry()
+    registry.collectors.append(_pool_collector(app))
+    registry.collectors.append(_cache_collector(app))
+    app.extensions["metrics"] = registry
+
+    if app.config["METRICS_DIR"]:
+        os.makedirs(app.config["METRICS_DIR"], exist_ok=True)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -33,6 +33,15 @@ class Product(db.Model):
 
 class Order(db.Model):
     __tablename__ = "orders"
+    # Filter and search predicates resolve to these columns; each index
+    # is ordered by createdAt to serve the default "-createdAt" listing
+    __table_args__ = (
+        db.Index("ix_orders_createdAt", "createdAt"),
+        db.Index("ix_orders_clientId_createdAt", "clientId", "createdAt"),
+        db.Index("ix_orders_productId_createdAt", "productId", "createdAt"),
+        db.Index("ix_orders_classId_createdAt", "classId", "createdAt"),
+        db.Index("ix_orders_genreId_createdAt", "genreId", "createdAt"),
+    )
     id = db.Column(db.String, primary_key=True, default=generate_uuid)
     clientId = db.Column(db.String, db.ForeignKey('clients.id'), nullable=False)
     productId = db.Column(db.String, db.ForeignKey('products.id'), nullable=False)
@@ -73,3 +82,72 @@ class Genre(db.Model):
     name = db.Column(db.String, unique=True, nullable=False)
     createdAt = db.Column(db.DateTime, default=datetime.utcnow)
     updatedAt = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyRevenue(db.Model):
+    """
+    Per EAT-day revenue and order count, per client and product.
+
+    Maintained in the same transaction as every order write (see
+    app.rollup) so the analytics endpoints never have to group the raw
+    orders table. Rows are never removed by order writes, so a day can
+    hold zero orders after deletions.
+    """
+    __tablename__ = "daily_revenue"
+    day = db.Column(db.Date, primary_key=True)
+    clientId = db.Column(db.String, primary_key=True)
+    productId = db.Column(db.String, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TableVersion(db.Model):
+    """
+    Write counter per table. Bumped in the same transaction as every write
+    through the API, so workers can tell with one tiny query whether data
+    they hold in memory is still current.
+    """
+    __tablename__ = "table_versions"
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class RowCount(db.Model):
+    """
+    Maintained row count of a large table, adjusted in the same
+    transaction as every insert and delete through the API so unfiltered
+    list totals need no COUNT(*). Seeded by ``flask counts rebuild``.
+    """
+    __tablename__ = "row_counts"
+    name = db.Column(db.String, primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class ExportJob(db.Model):
+    """
+    An invoice export rendered in the background (see app.jobs).
+
+    ``dedupKey`` identifies the parameters and the data version they were
+    requested against, so identical requests share one job. The row and
+    the result file outlive the process that rendered them.
+    """
+    __tablename__ = "export_jobs"
+    id = db.Column(db.String, primary_key=True, default=generate_uuid)
+    dedupKey = db.Column(db.String, nullable=False, unique=True)
+    format = db.Column(db.String, nullable=False)
+    clientId = db.Column(db.String, nullable=False)
+    startDate = db.Column(db.DateTime, nullable=False)
+    endDate = db.Column(db.DateTime, nullable=False)
+    # queued, running, done, failed
+    status = db.Column(db.String, nullable=False, default="queued")
+    rowsTotal = db.Column(db.Integer)
+    rowsDone = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String)
+    resultPath = db.Column(db.String)
+    resultSize = db.Column(db.BigInteger)
+    # Worker that owns the job and when it last confirmed it is alive
+    workerId = db.Column(db.String)
+    heartbeatAt = db.Column(db.DateTime)
+    createdAt = db.Column(db.DateTime, default=datetime.utcnow)
+    startedAt = db.Column(db.DateTime)
+    finishedAt = db.Column(db.DateTime)
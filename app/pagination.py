@@ -0,0 +1,131 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, or_, asc, desc
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def resolve_sort(model, sort, default="createdAt"):
+    """
+    Turn a ``sort`` / ``-sort`` argument into (column, descending).
+    Unknown names fall back to ``default`` so only real table columns
+    ever reach ORDER BY.
+    """
+    descending = sort.startswith("-")
+    name = sort[1:] if descending else sort
+    column = model.__table__.c.get(name)
+    if column is None:
+        name = default
+        column = model.__table__.c[default]
+    return name, column, descending
+
+
+def encode_cursor(sort, value, row_id):
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    payload = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _valid_sort_value(value, column):
+    """Whether a decoded cursor value can be compared with ``column``."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+
+    if python_type is bool:
+        return isinstance(value, bool)
+    if isinstance(value, bool):
+        return False
+    if python_type is None:
+        return isinstance(value, (str, int, float))
+    if issubclass(python_type, datetime):
+        return isinstance(value, datetime)
+    if issubclass(python_type, (int, float, Decimal)):
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+
+def decode_cursor(cursor, sort, column):
+    """
+    The (value, row_id) a cursor issued for ``sort`` points after. The value
+    must suit ``column``, the sort column, so it can be compared with it.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        if value is not None and not _valid_sort_value(value, column):
+            raise TypeError("sort value")
+        if not isinstance(row_id, str):
+            raise TypeError("row id")
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+
+    # A cursor is only meaningful for the ordering it was issued for
+    if cursor_sort != sort:
+        raise InvalidCursor("Cursor does not match sort")
+
+    return value, row_id
+
+
+def keyset_order(column, id_column, descending):
+    """
+    ORDER BY for seek pagination over the non-NULL values of ``column``:
+    the sort column, then the primary key as a unique tie-breaker. Plain
+    ASC/DESC so the (column) index can be walked in either direction.
+    """
+    direction = desc if descending else asc
+    return direction(column), direction(id_column)
+
+
+def keyset_filter(column, id_column, descending, value, row_id):
+    """
+    WHERE clause selecting rows strictly after (value, row_id) in the
+    ordering produced by ``keyset_order``. A ``value`` of None means the
+    cursor is inside the trailing block of NULL sort values.
+    """
+    after_id = id_column < row_id if descending else id_column > row_id
+
+    if value is None:
+        return and_(column.is_(None), after_id)
+
+    # The redundant bound gives the planner an index range to seek to
+    if descending:
+        return and_(column <= value, or_(column < value, and_(column == value, after_id)))
+    return and_(column >= value, or_(column > value, and_(column == value, after_id)))
+
+
+def seek_page(query, column, id_column, descending, after=None, limit=20):
+    """
+    Up to ``limit`` rows of ``query`` following ``after`` (a decoded
+    (value, row_id) cursor, or None for the first page), ordered by
+    ``column`` with NULLs last and ``id_column`` as tie-breaker.
+
+    Non-NULL values and the NULL block are read by separate index-friendly
+    queries; the second one only runs once the first is exhausted.
+    """
+    rows = []
+    in_null_block = after is not None and after[0] is None
+
+    if not in_null_block:
+        page = query.filter(column.isnot(None))
+        if after is not None:
+            page = page.filter(keyset_filter(column, id_column, descending, *after))
+        rows = page.order_by(*keyset_order(column, id_column, descending)).limit(limit).all()
+
+    if len(rows) < limit and column.nullable:
+        page = query.filter(column.is_(None))
+        if in_null_block:
+            page = page.filter(keyset_filter(column, id_column, descending, *after))
+        direction = desc if descending else asc
+        rows += page.order_by(direction(id_column)).limit(limit - len(rows)).all()
+
+    return rows
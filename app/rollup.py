@@ -0,0 +1,246 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import TIMESTAMP, case, cast, func, select, text, or_, and_, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models import db, Order, DailyRevenue
+
+EAT = timezone(timedelta(hours=3))
+
+# EAT calendar day of an order: DATE("createdAt" AT TIME ZONE 'Africa/Nairobi').
+# createdAt is a timestamptz; the cast only matters for tables created
+# with a naive column, whose values are UTC like the session time zone.
+EAT_DAY = func.date(
+    func.timezone("Africa/Nairobi", cast(Order.createdAt, TIMESTAMP(timezone=True)))
+)
+
+
+def eat_midnight_utc(day):
+    """UTC instant at which the given EAT calendar day starts."""
+    return datetime.combine(day, datetime.min.time(), tzinfo=EAT).astimezone(timezone.utc)
+
+
+# -------------------------
+# Write side
+# -------------------------
+
+def orders_rollup_select(condition, sign=1):
+    """
+    SELECT producing the rollup contribution of the orders matching
+    ``condition``, multiplied by ``sign`` (-1 to retract it).
+    """
+    return (
+        select(
+            EAT_DAY,
+            Order.clientId,
+            Order.productId,
+            func.sum(Order.totalCost) * sign,
+            func.count() * sign,
+        )
+        .where(condition)
+        .group_by(EAT_DAY, Order.clientId, Order.productId)
+    )
+
+
+def apply_rollup_delta(delta_select):
+    """
+    Add the (day, clientId, productId, revenue, orders) rows produced by
+    ``delta_select`` onto daily_revenue. Runs inside the caller's
+    transaction.
+    """
+    stmt = pg_insert(DailyRevenue).from_select(
+        ["day", "clientId", "productId", "revenue", "orders"],
+        delta_select,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "clientId", "productId"],
+        set_={
+            "revenue": DailyRevenue.revenue + stmt.excluded.revenue,
+            "orders": DailyRevenue.orders + stmt.excluded.orders,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def apply_orders_delta(condition, sign=1):
+    """
+    Add (sign=1) or retract (sign=-1) the matching orders from the rollup,
+    as they currently are in the database. Pending changes are flushed
+    first, so call it after creating an order and before changing or
+    deleting one.
+    """
+    apply_rollup_delta(orders_rollup_select(condition, sign))
+
+
+# -------------------------
+# Read side
+# -------------------------
+
+def segmented_daily_totals(bounds, client_id=None, product_id=None):
+    """
+    ``daily_totals`` for each of the consecutive ranges between the sorted
+    ``bounds``, as a list of (start_utc, end_utc, days), read with one
+    rollup query and one orders query for all of them.
+
+    Whole days between two bounds are read from daily_revenue. Only the
+    EAT days a bound falls inside go to the orders table, and those scans
+    are bounded by an index range on createdAt.
+    """
+    bounds = sorted(set(bounds))
+    if len(bounds) < 2:
+        return []
+    lo, hi = bounds[0], bounds[-1]
+    segments = [{} for _ in bounds[1:]]
+
+    def add(segment, day, revenue, orders):
+        prev_revenue, prev_orders = segment.get(day, (0.0, 0))
+        segment[day] = (prev_revenue + float(revenue), prev_orders + orders)
+
+    # Days cut by a bound that is not an EAT midnight
+    cut_days = set()
+    for bound in bounds:
+        bound_eat = bound.astimezone(EAT)
+        if bound_eat != datetime.combine(bound_eat.date(), datetime.min.time(), tzinfo=EAT):
+            cut_days.add(bound_eat.date())
+
+    first_full = lo.astimezone(EAT).date()
+    if first_full in cut_days:
+        first_full += timedelta(days=1)
+    end_full = hi.astimezone(EAT).date()
+
+    if first_full < end_full:
+        rollup = (
+            select(
+                DailyRevenue.day,
+                func.sum(DailyRevenue.revenue),
+                func.sum(DailyRevenue.orders),
+            )
+            .where(DailyRevenue.day >= first_full, DailyRevenue.day < end_full)
+            .group_by(DailyRevenue.day)
+            .having(func.sum(DailyRevenue.orders) > 0)
+        )
+        if cut_days:
+            rollup = rollup.where(DailyRevenue.day.notin_(sorted(cut_days)))
+        if client_id:
+            rollup = rollup.where(DailyRevenue.clientId == client_id)
+        if product_id:
+            rollup = rollup.where(DailyRevenue.productId == product_id)
+
+        for day, revenue, orders in db.session.execute(rollup):
+            index = bisect_right(bounds, eat_midnight_utc(day)) - 1
+            add(segments[index], day, revenue, int(orders))
+
+    edges = [
+        (max(lo, eat_midnight_utc(day)), min(hi, eat_midnight_utc(day + timedelta(days=1))))
+        for day in sorted(cut_days)
+    ]
+    if edges:
+        if len(bounds) > 2:
+            segment_index = case(
+                *[(Order.createdAt < bound, index) for index, bound in enumerate(bounds[1:-1])],
+                else_=len(bounds) - 2,
+            )
+        else:
+            segment_index = literal(0)
+        raw = (
+            select(EAT_DAY, segment_index, func.sum(Order.totalCost), func.count())
+            .where(or_(*[
+                and_(Order.createdAt >= a, Order.createdAt < b) for a, b in edges
+            ]))
+            .group_by(EAT_DAY, segment_index)
+        )
+        if client_id:
+            raw = raw.where(Order.clientId == client_id)
+        if product_id:
+            raw = raw.where(Order.productId == product_id)
+
+        for day, index, revenue, orders in db.session.execute(raw):
+            add(segments[index], day, revenue, orders)
+
+    return [
+        (start, end, [(day, *segment[day]) for day in sorted(segment)])
+        for start, end, segment in zip(bounds, bounds[1:], segments)
+    ]
+
+
+def totals_within(segments, start_utc, end_utc):
+    """
+    Merge the days of the ``segmented_daily_totals`` segments that lie in
+    start_utc <= createdAt < end_utc (both must be among the bounds).
+    """
+    totals = {}
+    for seg_start, seg_end, days in segments:
+        if start_utc <= seg_start and seg_end <= end_utc:
+            for day, revenue, orders in days:
+                prev_revenue, prev_orders = totals.get(day, (0.0, 0))
+                totals[day] = (prev_revenue + revenue, prev_orders + orders)
+    return [(day, *totals[day]) for day in sorted(totals)]
+
+
+def daily_totals(start_utc, end_utc, client_id=None, product_id=None):
+    """
+    Revenue and order count per EAT day for orders with
+    start_utc <= createdAt < end_utc, as a sorted list of
+    (day, revenue, orders).
+    """
+    if start_utc >= end_utc:
+        return []
+    [(_, _, days)] = segmented_daily_totals([start_utc, end_utc], client_id, product_id)
+    return days
+
+
+def period_totals(start_utc, end_utc):
+    """Total (revenue, orders) for start_utc <= createdAt < end_utc."""
+    days = daily_totals(start_utc, end_utc)
+    return float(sum(r for _, r, _ in days)), sum(n for _, _, n in days)
+
+
+# -------------------------
+# Maintenance
+# -------------------------
+
+def rebuild_rollup():
+    """Recompute daily_revenue from scratch. Runs in the current transaction."""
+    DailyRevenue.__table__.create(db.session.connection(), checkfirst=True)
+    db.session.execute(DailyRevenue.__table__.delete())
+    apply_rollup_delta(orders_rollup_select(literal(True)))
+
+
+def verify_rollup(tolerance=0.005):
+    """
+    Compare daily_revenue with a GROUP BY over the raw orders table and
+    return the (day, clientId, productId) keys that disagree, with the
+    rollup and raw (revenue, orders) for each.
+    """
+    rows = db.session.execute(
+        text("""
+            WITH raw AS (
+              SELECT
+                DATE(CAST("createdAt" AS TIMESTAMPTZ) AT TIME ZONE 'Africa/Nairobi') AS day,
+                "clientId", "productId",
+                SUM("totalCost") AS revenue,
+                COUNT(*) AS orders
+              FROM orders
+              GROUP BY 1, 2, 3
+            )
+            SELECT
+              COALESCE(r.day, raw.day) AS day,
+              COALESCE(r."clientId", raw."clientId") AS client_id,
+              COALESCE(r."productId", raw."productId") AS product_id,
+              COALESCE(r.revenue, 0) AS rollup_revenue,
+              COALESCE(r.orders, 0) AS rollup_orders,
+              COALESCE(raw.revenue, 0) AS raw_revenue,
+              COALESCE(raw.orders, 0) AS raw_orders
+            FROM daily_revenue r
+            FULL OUTER JOIN raw
+              ON r.day = raw.day
+             AND r."clientId" = raw."clientId"
+             AND r."productId" = raw."productId"
+            WHERE COALESCE(r.orders, 0) <> COALESCE(raw.orders, 0)
+               OR ABS(COALESCE(r.revenue, 0) - COALESCE(raw.revenue, 0)) > :tolerance
+            ORDER BY 1, 2, 3
+        """),
+        {"tolerance": tolerance}
+    ).fetchall()
+    return rows
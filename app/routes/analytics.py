@@ -5,6 +5,9 @@ from dateutil.parser import isoparse
 from flask import Blueprint, request, jsonify
 from sqlalchemy import text
 from app.models import db
+from app.rollup import daily_totals, period_totals, segmented_daily_totals, totals_within
+from app.cache import cached_response, cache_ranges, get_response_cache
+from app.transactions import follower_reads
 
 analytics_bp = Blueprint(
     "analytics",
@@ -123,6 +126,40 @@ def percentage(current, previous):
     return round(((current - previous) / previous) * 100, 2)
 
 
+# -------------------------
+# Cache keys
+# -------------------------
+
+def comparison_cache_key(args):
+    return {"period": args.get("period", "month")}
+
+def trend_cache_key(args):
+    period = args.get("period", "1month")
+    key = {"period": period}
+    if period == "custom":
+        # Equivalent spellings of the same range share an entry
+        start_utc, end_utc, _, _ = resolve_trend_period(
+            period, args.get("startDate"), args.get("endDate")
+        )
+        key["range"] = [start_utc.isoformat(), end_utc.isoformat()]
+    return key
+
+def dashboard_cache_key(args):
+    key = trend_cache_key({
+        "period": args.get("trendPeriod", "1month"),
+        "startDate": args.get("startDate"),
+        "endDate": args.get("endDate"),
+    })
+    key["comparison"] = args.get("period", "month")
+    return key
+
+def rankings_cache_key(args):
+    key = trend_cache_key(args)
+    key["clientId"] = args.get("clientId") or None
+    key["limit"] = int(args.get("limit", 10))
+    return key
+
+
 def return_problem():
     print(
             f"[ERROR] Could not mount or find a directory matching the invoice_dir directory: invoices_dir"
@@ -138,31 +175,23 @@ def return_problem():
 # -------------------------
 
 @analytics_bp.get("/earnings/comparison")
+@cached_response(comparison_cache_key)
 def earnings_comparison():
     # invoices directory check
     # return return_problem()
 
     period = request.args.get("period", "month")
     ranges = resolve_period(period)
+    cache_ranges(ranges["current"], ranges["previous"])
+    follower_reads()
 
-    def aggregate(start, end):
-        row = db.session.execute(
-            text("""
-                SELECT
-                  COALESCE(SUM("totalCost"), 0) AS revenue,
-                  COUNT(*) AS orders
-                FROM orders
-                WHERE "createdAt" >= :start
-                  AND "createdAt" < :end
-            """),
-            {"start": start, "end": end}
-        ).one()
-        return float(row.revenue), row.orders
-
-    cur_rev, cur_orders = aggregate(*ranges["current"])
-    prev_rev, prev_orders = aggregate(*ranges["previous"])
+    cur_rev, cur_orders = period_totals(*ranges["current"])
+    prev_rev, prev_orders = period_totals(*ranges["previous"])
 
-    return jsonify({
+    return jsonify(comparison_body(ranges, cur_rev, cur_orders, prev_rev, prev_orders))
+
+def comparison_body(ranges, cur_rev, cur_orders, prev_rev, prev_orders):
+    return {
         "currentPeriod": {
             "label": ranges["label"],
             "revenue": cur_rev,
@@ -179,9 +208,10 @@ def earnings_comparison():
         },
         "percentageChange": percentage(cur_rev, prev_rev),
         "ordersPercentageChange": percentage(cur_orders, prev_orders),
-    })
+    }
 
 @analytics_bp.get("/revenue/trend")
+@cached_response(trend_cache_key)
 def revenue_trend():
     # invoices directory check
     # return return_problem()
@@ -194,38 +224,31 @@ def revenue_trend():
         request.args.get("endDate")
     )
 
-    rows = db.session.execute(
-        text("""
-            SELECT
-              DATE("createdAt" AT TIME ZONE 'UTC' AT TIME ZONE 'Africa/Nairobi') AS date,
-              SUM("totalCost") AS revenue,
-              COUNT(*) AS orders
-            FROM orders
-            WHERE "createdAt" >= :start
-              AND "createdAt" < :end
-            GROUP BY 1
-            ORDER BY 1
-        """),
-        {"start": start_utc, "end": end_utc}
-    ).fetchall()
+    cache_ranges((start_utc, end_utc))
+    follower_reads()
+    rows = daily_totals(start_utc, end_utc)
 
+    return jsonify(revenue_trend_body(period, rows, start_eat, end_eat))
+
+def revenue_trend_body(period, rows, start_eat, end_eat):
     data = [{
-        "date": datetime.combine(r.date, datetime.min.time(), tzinfo=EAT).isoformat(),
-        "revenue": float(r.revenue),
-        "orders": r.orders,
-    } for r in rows]
+        "date": datetime.combine(day, datetime.min.time(), tzinfo=EAT).isoformat(),
+        "revenue": revenue,
+        "orders": orders,
+    } for day, revenue, orders in rows]
 
     total = sum(d["revenue"] for d in data)
     days = max((end_eat - start_eat).days, 1)
 
-    return jsonify({
+    return {
         "data": data,
         "total": round(total, 2),
         "averagePerDay": round(total / days, 2),
         "period": period,
-    })
+    }
 
 @analytics_bp.get("/orders/trend")
+@cached_response(trend_cache_key)
 def orders_trend():
     # invoices directory check
     # return return_problem()
@@ -238,36 +261,30 @@ def orders_trend():
         request.args.get("endDate")
     )
 
-    rows = db.session.execute(
-        text("""
-            SELECT
-              DATE("createdAt" AT TIME ZONE 'UTC' AT TIME ZONE 'Africa/Nairobi') AS date,
-              COUNT(*) AS count
-            FROM orders
-            WHERE "createdAt" >= :start
-              AND "createdAt" < :end
-            GROUP BY 1
-            ORDER BY 1
-        """),
-        {"start": start_utc, "end": end_utc}
-    ).fetchall()
+    cache_ranges((start_utc, end_utc))
+    follower_reads()
+    rows = daily_totals(start_utc, end_utc)
+
+    return jsonify(orders_trend_body(period, rows, start_eat, end_eat))
 
+def orders_trend_body(period, rows, start_eat, end_eat):
     data = [{
-        "date": datetime.combine(r.date, datetime.min.time(), tzinfo=EAT).isoformat(),
-        "count": r.count,
-    } for r in rows]
+        "date": datetime.combine(day, datetime.min.time(), tzinfo=EAT).isoformat(),
+        "count": orders,
+    } for day, _, orders in rows]
 
     total = sum(d["count"] for d in data)
     days = max((end_eat - start_eat).days, 1)
 
-    return jsonify({
+    return {
         "data": data,
         "total": total,
         "averagePerDay": round(total / days, 2),
         "period": period,
-    })
+    }
 
 @analytics_bp.get("/clients/earnings")
+@cached_response(rankings_cache_key)
 def client_rankings():
     # invoices directory check
     # return return_problem()
@@ -279,6 +296,9 @@ def client_rankings():
         request.args.get("endDate")
     )
 
+    cache_ranges((start_utc, end_utc))
+    follower_reads()
+
     client_id = request.args.get("clientId")
     limit = int(request.args.get("limit", 10))
 
@@ -327,3 +347,49 @@ def client_rankings():
             "label": human_label(period),
         },
     })
+
+@analytics_bp.get("/dashboard")
+@cached_response(dashboard_cache_key)
+def dashboard():
+    """
+    Everything the dashboard shows in one round trip: the same payloads as
+    /earnings/comparison (``period``), /revenue/trend and /orders/trend
+    (``trendPeriod``, plus ``startDate``/``endDate`` for custom), computed
+    from one read of the daily rollup over the union of both ranges.
+    """
+    # invoices directory check
+    # return return_problem()
+
+    period = request.args.get("period", "month")
+    trend_period = request.args.get("trendPeriod", "1month")
+
+    ranges = resolve_period(period)
+    trend_start, trend_end, trend_start_eat, trend_end_eat = resolve_trend_period(
+        trend_period,
+        request.args.get("startDate"),
+        request.args.get("endDate")
+    )
+    cache_ranges(ranges["current"], ranges["previous"], (trend_start, trend_end))
+    follower_reads()
+
+    segments = segmented_daily_totals([
+        *ranges["current"], *ranges["previous"], trend_start, trend_end,
+    ])
+
+    def totals(start_utc, end_utc):
+        days = totals_within(segments, start_utc, end_utc)
+        return float(sum(r for _, r, _ in days)), sum(n for _, _, n in days)
+
+    cur_rev, cur_orders = totals(*ranges["current"])
+    prev_rev, prev_orders = totals(*ranges["previous"])
+    trend = totals_within(segments, trend_start, trend_end)
+
+    return jsonify({
+        "comparison": comparison_body(ranges, cur_rev, cur_orders, prev_rev, prev_orders),
+        "revenueTrend": revenue_trend_body(trend_period, trend, trend_start_eat, trend_end_eat),
+        "ordersTrend": orders_trend_body(trend_period, trend, trend_start_eat, trend_end_eat),
+    })
+
+@analytics_bp.get("/cache/stats")
+def cache_stats():
+    return jsonify(get_response_cache().stats())
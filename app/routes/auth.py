@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from sqlalchemy import text
 from app.models import db
+from app.transactions import run_in_transaction
 
 
 def return_problem():
@@ -48,7 +49,8 @@ def change_password():
         }), 400
 
     # Update password
-    db.session.execute(
+    run_in_transaction(
+        db.session.execute,
         text("""
             UPDATE users
             SET password = :new_password, updated_at = NOW()
@@ -56,8 +58,6 @@ def change_password():
         {"new_password": new_password}
     )
 
-    db.session.commit()
-
     return jsonify({
         "success": True,
         "message": "Password updated successfully"
@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app.models import db, Class, Genre
+from app.dimensions import get_dimensions, dimensions_changed
+from app.counts import filter_signature, list_total
+from app.etags import conditional
+from app.transactions import run_in_transaction
 
 
 def return_problem():
@@ -16,11 +20,12 @@ meta_bp = Blueprint("meta", __name__, url_prefix="/api/v1/meta")
 
 # --- Classes ---
 @meta_bp.route("/classes", methods=["GET"])
+@conditional("classes")
 def get_classes():
     # invoices directory check
     # return return_problem()
 
-    return jsonify([{"id": c.id, "name": c.name} for c in Class.query.all()])
+    return jsonify(get_dimensions().all_classes())
 
 @meta_bp.route("/classes", methods=["POST"])
 def add_class():
@@ -28,18 +33,24 @@ def add_class():
     # return return_problem()
 
     data = request.json
-    new_class = Class(name=data["name"])
-    db.session.add(new_class)
-    db.session.commit()
+
+    def write():
+        new_class = Class(name=data["name"])
+        db.session.add(new_class)
+        dimensions_changed("classes")
+        return new_class
+
+    new_class = run_in_transaction(write)
     return jsonify({"id": new_class.id, "name": new_class.name}), 201
 
 # --- Genres ---
 @meta_bp.route("/genres", methods=["GET"])
+@conditional("genres")
 def get_genres():
     # invoices directory check
     # return return_problem()
 
-    return jsonify([{"id": g.id, "name": g.name} for g in Genre.query.all()])
+    return jsonify(get_dimensions().all_genres())
 
 @meta_bp.route("/genres", methods=["POST"])
 def add_genre():
@@ -47,15 +58,21 @@ def add_genre():
     # return return_problem()
 
     data = request.json
-    new_genre = Genre(name=data["name"])
-    db.session.add(new_genre)
-    db.session.commit()
+
+    def write():
+        new_genre = Genre(name=data["name"])
+        db.session.add(new_genre)
+        dimensions_changed("genres")
+        return new_genre
+
+    new_genre = run_in_transaction(write)
     return jsonify({"id": new_genre.id, "name": new_genre.name}), 201
 
 classes_bp = Blueprint("classes", __name__, url_prefix="/api/v1/classes")
 
 
 @classes_bp.route("", methods=["GET"])
+@conditional("classes")
 def list_classes():
     # invoices directory check
     # return return_problem()
@@ -69,7 +86,9 @@ def list_classes():
     if search:
         query = query.filter(Class.name.ilike(f"%{search}%"))
 
-    total = query.count()
+    total, estimated = list_total(
+        query, "classes", filter_signature(request.args, ("search",)), request.args
+    )
 
     classes = (
         query
@@ -79,9 +98,12 @@ def list_classes():
         .all()
     )
 
-    return jsonify({
+    body = {
         "data": [{"id": c.id, "name": c.name} for c in classes],
         "total": total,
         "page": page,
         "page_size": page_size
-    })
+    }
+    if estimated:
+        body["totalEstimated"] = True
+    return jsonify(body)
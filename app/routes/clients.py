@@ -1,5 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app.models import db, Client
+from app.counts import adjust_row_count, filter_signature, list_total
+from app.dimensions import bump_version
+from app.etags import conditional
+from app.serializers import isoformat_many, rows_to_dicts
+from app.transactions import run_in_transaction
 from sqlalchemy import or_, desc
 
 def return_problem():
@@ -26,7 +31,17 @@ def client_to_dict(client: Client):
     }
 
 
+# List pages serialize these columns straight from Row tuples
+CLIENT_COLUMNS = (
+    Client.id, Client.clientName, Client.institution, Client.phone,
+    Client.email, Client.createdAt, Client.updatedAt,
+)
+CLIENT_CONVERTERS = {"createdAt": isoformat_many, "updatedAt": isoformat_many}
+CLIENT_FILTERS = ("search", "start_date", "end_date")
+
+
 @clients_bp.route("", methods=["GET"])
+@conditional("clients")
 def get_clients():
     # invoices directory check
     # return return_problem()
@@ -38,7 +53,7 @@ def get_clients():
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
 
-    query = Client.query
+    query = db.session.query(*CLIENT_COLUMNS)
 
     if search:
         query = query.filter(
@@ -63,15 +78,21 @@ def get_clients():
         except ValueError:
             pass
 
-    clients = query.paginate(page=page, per_page=page_size, error_out=False)
+    clients = query.paginate(page=page, per_page=page_size, error_out=False, count=False)
+    clients.total, estimated = list_total(
+        query, "clients", filter_signature(request.args, CLIENT_FILTERS), request.args
+    )
 
-    return jsonify({
-        "data": [client_to_dict(c) for c in clients.items],
+    body = {
+        "data": rows_to_dicts(clients.items, CLIENT_CONVERTERS),
         "total": clients.total,
         "page": page,
         "page_size": page_size,
         "totalPages": clients.pages
-    })
+    }
+    if estimated:
+        body["totalEstimated"] = True
+    return jsonify(body)
 
 
 
@@ -81,9 +102,15 @@ def create_client():
     # return return_problem()
 
     data = request.json
-    client = Client(**data)
-    db.session.add(client)
-    db.session.commit()
+
+    def write():
+        client = Client(**data)
+        db.session.add(client)
+        bump_version("clients")
+        adjust_row_count("clients", 1)
+        return client
+
+    client = run_in_transaction(write)
     return jsonify(client_to_dict(client)), 201
 
 @clients_bp.route("/<client_id>", methods=["PUT", "PATCH"])
@@ -91,19 +118,24 @@ def update_client(client_id):
     # invoices directory check
     # return return_problem()
 
-    client = Client.query.get(client_id)
-    if not client:
-        return jsonify({"error": "Client not found"}), 404
-
     data = request.json
 
-    # Update allowed fields
-    client.clientName = data.get("clientName", client.clientName)
-    client.institution = data.get("institution", client.institution)
-    client.phone = data.get("phone", client.phone)
-    client.email = data.get("email", client.email)
+    def write():
+        client = Client.query.get(client_id)
+        if not client:
+            return None
+
+        # Update allowed fields
+        client.clientName = data.get("clientName", client.clientName)
+        client.institution = data.get("institution", client.institution)
+        client.phone = data.get("phone", client.phone)
+        client.email = data.get("email", client.email)
+        bump_version("clients")
+        return client
 
-    db.session.commit()
+    client = run_in_transaction(write)
+    if not client:
+        return jsonify({"error": "Client not found"}), 404
 
     return jsonify(client_to_dict(client))
 
@@ -112,10 +144,15 @@ def delete_client(client_id):
     # invoices directory check
     # return return_problem()
 
-    client = Client.query.get(client_id)
-    if not client:
-        return jsonify({"error": "Client not found"}), 404
+    def write():
+        client = Client.query.get(client_id)
+        if not client:
+            return False
+        db.session.delete(client)
+        bump_version("clients")
+        adjust_row_count("clients", -1)
+        return True
 
-    db.session.delete(client)
-    db.session.commit()
+    if not run_in_transaction(write):
+        return jsonify({"error": "Client not found"}), 404
     return '', 204
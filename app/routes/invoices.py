@@ -30,8 +30,14 @@ def get_invoice_data():
     invoice = generate_invoice(client_id, start_date, end_date)
     return jsonify(invoice)
 
-from flask import Blueprint, request, jsonify, send_file
+import os
+
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context, url_for
 from app.services import generate_invoice, generate_invoice_excel, generate_invoice_pdf
+from app.invoice_cache import get_invoice_cache, invoice_data_version
+from app.invoice_batch import FORMATS as BATCH_FORMATS, iter_invoice_zip
+from app.jobs import FORMATS, QueueFull, get_job_runner, job_to_dict
+from app.models import db, ExportJob
 from datetime import datetime
 
 invoices_bp = Blueprint("invoices", __name__, url_prefix="/api/v1/invoices")
@@ -48,6 +54,21 @@ def get_invoice_data():
     invoice = generate_invoice(client_id, start_date, end_date)
     return jsonify(invoice)
 
+def cached_invoice(client_id, start_date, end_date, ext, write):
+    """
+    Return an open file with the rendered invoice, rendering it only when
+    the cache has no artifact for the current version of the data.
+    """
+    cache = get_invoice_cache()
+    version = invoice_data_version(client_id, start_date, end_date)
+    key = cache.key(client_id, start_date.isoformat(), end_date.isoformat(), ext, version)
+
+    f = cache.open(key, ext)
+    if f is None:
+        f = cache.store(key, ext, write)
+    return f
+
+
 @invoices_bp.route("/download/excel", methods=["GET"])
 def download_invoice_excel():
     # invoices directory check
@@ -57,8 +78,10 @@ def download_invoice_excel():
     start_date = datetime.fromisoformat(request.args.get("startDate"))
     end_date = datetime.fromisoformat(request.args.get("endDate")).replace(hour=23, minute=59, second=59)
 
-    invoice = generate_invoice(client_id, start_date, end_date)
-    excel_file = generate_invoice_excel(invoice)
+    excel_file = cached_invoice(
+        client_id, start_date, end_date, "xlsx",
+        lambda out: generate_invoice_excel(out, client_id, start_date, end_date)
+    )
     return send_file(
         excel_file,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -74,11 +97,112 @@ def download_invoice_pdf():
     client_id = request.args.get("clientId")
     start_date = datetime.fromisoformat(request.args.get("startDate"))
     end_date = datetime.fromisoformat(request.args.get("endDate")).replace(hour=23, minute=59, second=59)
-    invoice = generate_invoice(client_id, start_date, end_date)
-    pdf_file = generate_invoice_pdf(invoice)
-    return send_file(
-        pdf_file,
+    download_name = f"invoice_{client_id}_{start_date.date()}_{end_date.date()}.pdf"
+
+    cache = get_invoice_cache()
+    version = invoice_data_version(client_id, start_date, end_date)
+    key = cache.key(client_id, start_date.isoformat(), end_date.isoformat(), "pdf", version)
+
+    pdf_file = cache.open(key, "pdf")
+    if pdf_file is not None:
+        return send_file(
+            pdf_file,
+            mimetype='application/pdf',
+            download_name=download_name,
+            as_attachment=True
+        )
+
+    # Cache miss: send each page as soon as it is rendered, filling the
+    # cache on the way through
+    try:
+        pages = generate_invoice_pdf(client_id, start_date, end_date)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+    return Response(
+        stream_with_context(cache.stream_store(key, "pdf", pages)),
         mimetype='application/pdf',
-        download_name=f"invoice_{client_id}_{start_date.date()}_{end_date.date()}.pdf",
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+    )
+
+@invoices_bp.route("/batch", methods=["GET"])
+def download_invoice_batch():
+    """Every client's invoice for the period, one file per client, as a streamed ZIP"""
+    fmt = request.args.get("format", "excel")
+    if fmt not in BATCH_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(BATCH_FORMATS)}"}), 400
+
+    start_date = datetime.fromisoformat(request.args.get("startDate"))
+    end_date = datetime.fromisoformat(request.args.get("endDate")).replace(hour=23, minute=59, second=59)
+    chunks = iter_invoice_zip(start_date, end_date, fmt)
+    download_name = f"invoices_{start_date.date()}_{end_date.date()}_{fmt}.zip"
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+    )
+
+
+# ---- Background exports ----
+
+def job_response(job):
+    data = job_to_dict(job)
+    if job.status == "done":
+        data["resultUrl"] = url_for("invoices.download_export_job", job_id=job.id)
+    return data
+
+
+@invoices_bp.route("/jobs", methods=["POST"])
+def create_export_job():
+    data = request.get_json() or {}
+
+    fmt = data.get("format")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    if not data.get("clientId") or not data.get("startDate") or not data.get("endDate"):
+        return jsonify({"error": "clientId, startDate and endDate are required"}), 400
+    try:
+        start_date = datetime.fromisoformat(data["startDate"])
+        end_date = datetime.fromisoformat(data["endDate"]).replace(hour=23, minute=59, second=59)
+    except (TypeError, ValueError):
+        return jsonify({"error": "startDate and endDate must be ISO dates"}), 400
+
+    try:
+        job, created = get_job_runner().submit(fmt, data["clientId"], start_date, end_date)
+    except QueueFull:
+        response = jsonify({"error": "Export queue is full, retry later"})
+        response.headers["Retry-After"] = str(current_app.config["EXPORT_RETRY_AFTER"])
+        return response, 503
+
+    response = jsonify(job_response(job))
+    response.headers["Location"] = url_for("invoices.get_export_job", job_id=job.id)
+    return response, 202 if created else 200
+
+
+@invoices_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_export_job(job_id):
+    job = db.session.get(ExportJob, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    # Pick the job up here if the worker that owned it has gone away
+    if get_job_runner().recover(job):
+        job = db.session.get(ExportJob, job_id)
+    return jsonify(job_response(job))
+
+
+@invoices_bp.route("/jobs/<job_id>/result", methods=["GET"])
+def download_export_job(job_id):
+    job = db.session.get(ExportJob, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status != "done":
+        return jsonify({"error": f"Job is {job.status}"}), 409
+    if not job.resultPath or not os.path.exists(job.resultPath):
+        return jsonify({"error": "Result is no longer available"}), 410
+
+    ext, mimetype = FORMATS[job.format]
+    return send_file(
+        job.resultPath,
+        mimetype=mimetype,
+        download_name=f"invoice_{job.clientId}_{job.startDate.date()}_{job.endDate.date()}.{ext}",
         as_attachment=True
     )
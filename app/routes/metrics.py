@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+from app.metrics import render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus scrape target, summed over every worker process."""
+    if "metrics" not in current_app.extensions:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -1,10 +1,26 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+
+from flask import Blueprint, request, jsonify, current_app
 from app.models import db, Order, Class, Genre, Client, Product
-from app.services import create_order
+from app.services import (
+    create_order, validate_bulk_rows, bulk_create_orders, BulkInsertFailed,
+    resolve_bulk_changes, bulk_update_orders, bulk_delete_orders,
+)
+from app.rollup import apply_orders_delta
+from app.cache import invalidate_orders
+from app.search import order_search_condition
+from app.dimensions import bump_version, get_dimensions
+from app.counts import adjust_row_count, filter_signature, list_total
+from app.etags import conditional
+from app.serializers import eat_isoformat_many
+from app.transactions import run_in_transaction
 
 from flask import Blueprint, request, jsonify
 from app.models import db, Order
 from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 
 orders_bp = Blueprint("orders", __name__, url_prefix="/api/v1/orders")
 
@@ -23,32 +39,234 @@ def to_eat(dt):
 
     return dt.astimezone(EAT).isoformat()
 
-def order_to_dict(order: Order):
-    return {
+# Nested objects an order can be expanded with, and the relationship
+# that has to be loaded for each of them.
+ORDER_RELATIONS = {
+    "client": Order.client,
+    "product": Order.product,
+    "class": Order.order_class,
+    "genre": Order.order_genre,
+}
+
+ORDER_FIELDS = (
+    "id", "totalCost", "pagesOrSlides", "description", "week", "createdAt",
+) + tuple(ORDER_RELATIONS)
+
+
+def _split_param(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def parse_order_view(args):
+    """
+    Read the ``fields=`` / ``expand=`` sparse fieldset parameters.
+
+    Returns (fields, expand): the top-level keys to emit (None for all)
+    and the nested objects to include. Without either parameter every
+    field and all four nested objects are returned, as before.
+    """
+    fields = None
+    if args.get("fields"):
+        fields = [f for f in _split_param(args["fields"]) if f in ORDER_FIELDS]
+        if "id" not in fields:
+            fields.insert(0, "id")
+
+    if "expand" in args:
+        expand = [e for e in _split_param(args["expand"]) if e in ORDER_RELATIONS]
+    elif fields is not None:
+        expand = [f for f in fields if f in ORDER_RELATIONS]
+    else:
+        expand = list(ORDER_RELATIONS)
+
+    if fields is not None:
+        # An expanded relation is always emitted, even if not in fields
+        fields += [e for e in expand if e not in fields]
+
+    return fields, expand
+
+
+# Served from the per-worker dimension cache instead of a join
+CACHED_RELATIONS = ("product", "class", "genre")
+
+
+def order_load_options(expand):
+    """
+    Eager-load the many-to-one relationships needed for ``expand`` in the
+    same SELECT, so serializing a page never goes back to the database.
+    Products, classes and genres come from the dimension cache and are
+    only loaded if the cache misses.
+    """
+    return [
+        joinedload(ORDER_RELATIONS[name])
+        for name in expand if name not in CACHED_RELATIONS
+    ]
+
+
+def order_to_dict(order: Order, fields=None, expand=None):
+    if expand is None:
+        expand = ORDER_RELATIONS
+
+    data = {
         "id": order.id,
         "totalCost": order.totalCost,
         "pagesOrSlides": order.pagesOrSlides,
         "description": order.description,
         "week": order.week,
         "createdAt": to_eat(order.createdAt),
-        "client": {
+    }
+
+    if "client" in expand:
+        data["client"] = {
             "id": order.client.id,
             "clientName": order.client.clientName
-        } if order.client else None,
-        "product": {
-            "id": order.product.id,
-            "name": order.product.name,
-            "pricePerUnit": order.product.pricePerUnit,
-        } if order.product else None,
-        "class": {
-            "id": order.order_class.id,
-            "name": order.order_class.name,
-        } if order.order_class else None,
-        "genre": {
-            "id": order.order_genre.id,
-            "name": order.order_genre.name,
-        } if order.order_genre else None,
-    }
+        } if order.client else None
+
+    dims = get_dimensions()
+    if "product" in expand:
+        product = dims.get_product(order.productId)
+        if product is None and order.product:
+            product = {
+                "id": order.product.id,
+                "name": order.product.name,
+                "pricePerUnit": order.product.pricePerUnit,
+            }
+        data["product"] = dict(product) if product else None
+    if "class" in expand:
+        order_class = dims.get_class(order.classId) if order.classId else None
+        if order_class is None and order.order_class:
+            order_class = {
+                "id": order.order_class.id,
+                "name": order.order_class.name,
+            }
+        data["class"] = dict(order_class) if order_class else None
+    if "genre" in expand:
+        genre = dims.get_genre(order.genreId) if order.genreId else None
+        if genre is None and order.order_genre:
+            genre = {
+                "id": order.order_genre.id,
+                "name": order.order_genre.name,
+            }
+        data["genre"] = dict(genre) if genre else None
+
+    if fields is not None:
+        data = {k: data[k] for k in fields if k in data}
+
+    return data
+
+
+# Columns read for list pages, which serialize Row tuples directly
+# instead of building Order objects
+ORDER_ROW_COLUMNS = (
+    Order.id, Order.totalCost, Order.pagesOrSlides, Order.description,
+    Order.week, Order.createdAt, Order.clientId, Order.productId,
+    Order.classId, Order.genreId,
+)
+
+
+def order_row_query(expand, sort_col):
+    """Query for list rows; the client name is joined in only if expanded."""
+    columns = list(ORDER_ROW_COLUMNS)
+    if sort_col.name not in {c.key for c in columns}:
+        # Cursor pages read the sort value back from the last row
+        columns.append(sort_col)
+    query = db.session.query(*columns)
+    if "client" in expand:
+        query = query.add_columns(Client.clientName).outerjoin(
+            Client, Client.id == Order.clientId
+        )
+    return query
+
+
+def _dimension_map(cached, model, ids, to_dict):
+    """
+    The dimension cache's id -> dict map, plus any of ``ids`` it does not
+    know yet (rows written since the last refresh), loaded in one query.
+    """
+    missing = {i for i in ids if i is not None and i not in cached}
+    if not missing:
+        return cached
+    found = dict(cached)
+    found.update((m.id, to_dict(m)) for m in model.query.filter(model.id.in_(missing)))
+    return found
+
+
+def order_rows_to_dicts(rows, fields=None, expand=None):
+    """
+    ``order_to_dict`` for a page of rows from ``order_row_query``, with
+    timestamps converted a column at a time and dimensions looked up once
+    per page.
+    """
+    if expand is None:
+        expand = ORDER_RELATIONS
+    if not rows:
+        return []
+
+    # Work a column at a time: unpacking beats Row attribute access
+    columns = list(zip(*rows))
+    (ids, costs, pages, descriptions, weeks, created,
+     client_ids, product_ids, class_ids, genre_ids) = columns[:len(ORDER_ROW_COLUMNS)]
+    created = eat_isoformat_many(created)
+    # order_row_query adds the client name last
+    client_names = columns[-1] if "client" in expand else None
+
+    dims = get_dimensions()
+    dims.refresh()
+    # The cached dicts are serialized straight away and never mutated,
+    # so rows can share them
+    products = classes = genres = None
+    if "product" in expand:
+        products = _dimension_map(
+            dims.products, Product, product_ids,
+            lambda p: {"id": p.id, "name": p.name, "pricePerUnit": p.pricePerUnit},
+        )
+    if "class" in expand:
+        classes = _dimension_map(
+            dims.classes, Class, class_ids,
+            lambda c: {"id": c.id, "name": c.name},
+        )
+    if "genre" in expand:
+        genres = _dimension_map(
+            dims.genres, Genre, genre_ids,
+            lambda g: {"id": g.id, "name": g.name},
+        )
+
+    out = []
+    for i, order_id in enumerate(ids):
+        data = {
+            "id": order_id,
+            "totalCost": costs[i],
+            "pagesOrSlides": pages[i],
+            "description": descriptions[i],
+            "week": weeks[i],
+            "createdAt": created[i],
+        }
+        if client_names is not None:
+            data["client"] = {
+                "id": client_ids[i],
+                "clientName": client_names[i],
+            } if client_names[i] is not None else None
+        if products is not None:
+            data["product"] = products.get(product_ids[i])
+        if classes is not None:
+            data["class"] = classes.get(class_ids[i]) if class_ids[i] else None
+        if genres is not None:
+            data["genre"] = genres.get(genre_ids[i]) if genre_ids[i] else None
+
+        if fields is not None:
+            data = {k: data[k] for k in fields if k in data}
+        out.append(data)
+    return out
+
+
+def load_order(order_id, expand):
+    """Reload a single order together with the relations to serialize."""
+    return (
+        Order.query
+        .options(*order_load_options(expand))
+        .populate_existing()
+        .filter(Order.id == order_id)
+        .one()
+    )
 
 
 def return_problem():
@@ -66,41 +284,28 @@ def add_order():
     # invoices directory check
     # return return_problem()
     data = request.json
+    fields, expand = parse_order_view(request.args)
     order = create_order(data)
-    return jsonify(order_to_dict(order)), 201
+    order = load_order(order.id, expand)
+    return jsonify(order_to_dict(order, fields, expand)), 201
 
 from datetime import datetime
-from sqlalchemy import or_, desc
-
-@orders_bp.route("", methods=["GET"])
-def get_orders():
-
-    # invoices directory check
-    # return return_problem()
-
-    # Pagination
-    page = int(request.args.get("page", 1))
-    # page = 1
-    page_size = int(request.args.get("pageSize", request.args.get("page_size", 20)))
-
-    # Filters
-    search = request.args.get("search")
-    client_id = request.args.get("clientId")
-    product_id = request.args.get("productId")
-    class_id = request.args.get("classId")
-    start_date = request.args.get("startDate")
-    end_date = request.args.get("endDate")
-    sort = request.args.get("sort", "-createdAt")
-
-    print("\n========== INCOMING REQUEST ==========")
-    print("Raw args:", dict(request.args))
-    print("Client ID:", client_id)
-    print("Class ID:", class_id)
-    print("Start Date:", start_date)
-    print("End Date:", end_date)
-    print("======================================\n")
+from sqlalchemy import desc
+from app.pagination import (
+    InvalidCursor, resolve_sort, encode_cursor, decode_cursor, seek_page,
+)
 
-    query = Order.query
+def apply_order_filters(query, args):
+    """
+    Apply the list filters accepted by GET /orders (date range, client,
+    class, product and free-text search) to an Order query.
+    """
+    search = args.get("search")
+    client_id = args.get("clientId")
+    product_id = args.get("productId")
+    class_id = args.get("classId")
+    start_date = args.get("startDate")
+    end_date = args.get("endDate")
 
     # ---- Date filtering ----
     if start_date:
@@ -110,8 +315,6 @@ def get_orders():
 
         utc_start = eat_start.astimezone(timezone.utc)
 
-        print("Converted START UTC:", utc_start)
-
         query = query.filter(Order.createdAt >= utc_start)
 
     if end_date:
@@ -137,53 +340,289 @@ def get_orders():
 
     # ---- Search filtering ----
     if search:
-        query = query.filter(
-            or_(
-                Order.order_class.has(Class.name.ilike(f"%{search}%")),
-                Order.order_genre.has(Genre.name.ilike(f"%{search}%")),
-                Order.client.has(Client.clientName.ilike(f"%{search}%")),
-                Order.product.has(Product.name.ilike(f"%{search}%")),
-                Order.product.has(Client.institution.ilike(f"%{search}%")),
-            )
-        )
+        query = query.filter(order_search_condition(search))
+
+    return query
+
 
+ORDER_FILTERS = ("search", "clientId", "productId", "classId", "startDate", "endDate")
+
+# Search matches dimension names, so its totals depend on them too
+SEARCH_TABLES = ("classes", "genres", "clients", "products")
+
+
+def order_list_total(query, args):
+    """(total, estimated) for the filtered order list, see app.counts"""
+    depends_on = SEARCH_TABLES if args.get("search") else ()
+    return list_total(
+        query, "orders", filter_signature(args, ORDER_FILTERS), args, depends_on
+    )
+
+
+def wants_total(args):
+    return args.get("includeTotal", "").lower() in ("1", "true", "yes")
+
+
+@orders_bp.route("", methods=["GET"])
+@conditional("orders", "clients", "products", "classes", "genres")
+def get_orders():
+
+    # invoices directory check
+    # return return_problem()
+
+    # Pagination
+    page = int(request.args.get("page", 1))
+    # page = 1
+    page_size = int(request.args.get("pageSize", request.args.get("page_size", 20)))
+    cursor = request.args.get("cursor")
+
+    sort = request.args.get("sort", "-createdAt")
+
+    fields, expand = parse_order_view(request.args)
 
     # ---- Sorting ----
-    if sort.startswith("-"):
-        sort_col = getattr(Order, sort[1:], Order.createdAt)
+    sort_name, sort_col, sort_desc = resolve_sort(Order, sort)
+
+    query = apply_order_filters(order_row_query(expand, sort_col), request.args)
+
+    # ---- Cursor (keyset) pagination ----
+    # Opt-in with ?cursor= (empty for the first page). Seeks on
+    # (sort column, id) so every page costs the same as the first one.
+    if cursor is not None:
+        sort_key = f"-{sort_name}" if sort_desc else sort_name
+
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, sort_key, sort_col)
+            except InvalidCursor as e:
+                return jsonify({"error": str(e)}), 400
+
+        rows = seek_page(query, sort_col, Order.id, sort_desc, after, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor(sort_key, getattr(last, sort_name), last.id)
+
+        body = {
+            "data": order_rows_to_dicts(rows, fields, expand),
+            "nextCursor": next_cursor,
+            "page_size": page_size,
+        }
+        if wants_total(request.args):
+            body["total"], estimated = order_list_total(query, request.args)
+            if estimated:
+                body["totalEstimated"] = True
+
+        return jsonify(body), 200
+
+    if sort_desc:
         query = query.order_by(desc(sort_col))
     else:
-        sort_col = getattr(Order, sort, Order.createdAt)
         query = query.order_by(sort_col)
 
-    print("\nGenerated SQL:")
-    print(str(query.statement.compile(compile_kwargs={'literal_binds': True})))
-    print("\n")
-
-    print("Matching rows BEFORE pagination:", query.count())
-
     # ---- Pagination ----
     pagination = query.paginate(
         page=page,
         per_page=page_size,
-        error_out=False
+        error_out=False,
+        count=False
     )
+    pagination.total, estimated = order_list_total(query, request.args)
 
-    print("Items in current page:", len(pagination.items))
-    for o in pagination.items:
-        print("Order ID:", o.id)
-
-
-    return jsonify({
-        "data": [order_to_dict(o) for o in pagination.items],
+    body = {
+        "data": order_rows_to_dicts(pagination.items, fields, expand),
         "total": pagination.total,
         "page": page,
         "page_size": page_size,
         "totalPages": pagination.pages
-    }), 200
+    }
+    if estimated:
+        body["totalEstimated"] = True
+    return jsonify(body), 200
+
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def parse_bulk_payload():
+    """
+    Read bulk order rows from a JSON array (or {"orders": [...]}), NDJSON
+    or CSV body. Returns a list of rows, or None if the body can't be read.
+    Unparseable NDJSON lines are kept as None and reported per row.
+    """
+    mimetype = request.mimetype
+
+    if mimetype in NDJSON_MIMETYPES:
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+        return rows
+
+    if mimetype == "text/csv":
+        reader = csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+        return [dict(row) for row in reader]
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("orders")
+    return data if isinstance(data, list) else None
+
+
+@orders_bp.route("/bulk", methods=["POST"])
+def bulk_add_orders():
+    """
+    Create many orders in one call. Accepts a JSON array, NDJSON or CSV
+    (columns: clientId, productId, pagesOrSlides, orderClass, genre, week,
+    description, orderDate). Valid rows are inserted in multi-row batches;
+    invalid rows are reported by index. With ?atomic=true nothing is
+    inserted unless every row is valid.
+    """
+    rows = parse_bulk_payload()
+    if rows is None:
+        return jsonify({"error": "Expected a JSON array, NDJSON or CSV body"}), 400
+
+    max_rows = current_app.config["BULK_MAX_ROWS"]
+    if len(rows) > max_rows:
+        return jsonify({"error": f"At most {max_rows} rows per request"}), 413
+
+    atomic = request.args.get("atomic", "").lower() in ("1", "true", "yes")
+
+    orders, errors = validate_bulk_rows(rows)
+    if atomic and errors:
+        orders = []
+
+    inserted = 0
+    if orders:
+        try:
+            inserted = bulk_create_orders(
+                orders,
+                batch_size=current_app.config["BULK_BATCH_SIZE"],
+                atomic=atomic,
+            )
+        except BulkInsertFailed as e:
+            current_app.logger.exception("Bulk order insert failed")
+            # Earlier batches are committed; say which so the caller can
+            # resubmit only the rest
+            return jsonify({
+                "error": "Insert failed; only the orders listed in ids were saved",
+                "inserted": len(e.committed),
+                "failed": len(errors),
+                "errors": errors,
+                "ids": [o["id"] for o in e.committed],
+            }), 500
+
+    return jsonify({
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors,
+        "ids": [o["id"] for o in orders],
+    }), 400 if errors and not inserted else 201
+
+
+def bulk_target_chunks(body, chunk_size):
+    """
+    Yield lists of order ids selected by a bulk request, either from an
+    explicit ``ids`` list or from a ``filter`` object taking the same keys
+    as the GET /orders query string. Filtered ids are read one chunk at a
+    time in id order, so chunks never overlap.
+    """
+    if "ids" in body:
+        ids = list(dict.fromkeys(body["ids"]))
+        for start in range(0, len(ids), chunk_size):
+            yield ids[start:start + chunk_size]
+        return
+
+    base = apply_order_filters(Order.query, body["filter"]).with_entities(Order.id)
+    last_id = None
+    while True:
+        query = base
+        if last_id is not None:
+            query = query.filter(Order.id > last_id)
+        ids = [row.id for row in query.order_by(Order.id).limit(chunk_size)]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def bulk_target_error(body):
+    if not isinstance(body, dict):
+        return "Expected a JSON object"
+    if "ids" in body:
+        ids = body["ids"]
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            return "ids must be a list of strings"
+        return None
+    if isinstance(body.get("filter"), dict):
+        for name in ORDER_FILTERS:
+            value = body["filter"].get(name)
+            if value is not None and not isinstance(value, str):
+                return f"filter.{name} must be a string"
+        for name in ("startDate", "endDate"):
+            if body["filter"].get(name):
+                try:
+                    datetime.fromisoformat(body["filter"][name])
+                except ValueError:
+                    return f"filter.{name} must be an ISO 8601 date"
+        # An empty filter matches every order; require it to be explicit
+        if not any(body["filter"].values()) and not body.get("all"):
+            return 'Empty filter: pass "all": true to target every order'
+        return None
+    return "Provide ids or filter"
+
+
+@orders_bp.route("", methods=["PATCH"])
+def bulk_update():
+    """
+    Update many orders at once.
+    Body: {"ids": [...]} or {"filter": {...}}, plus "set" with any of
+    week, clientId, productId, orderClass, genre, pagesOrSlides,
+    description, orderDate.
+    """
+    body = request.get_json(silent=True)
+    error = bulk_target_error(body)
+    if error:
+        return jsonify({"error": error}), 400
+
+    changes = body.get("set")
+    if not isinstance(changes, dict) or not changes:
+        return jsonify({"error": "Nothing to update"}), 400
+
+    values, errors = resolve_bulk_changes(changes)
+    if errors:
+        return jsonify({"error": "Validation failed", "details": errors}), 400
+    if not values:
+        return jsonify({"error": "Nothing to update"}), 400
+
+    chunks = bulk_target_chunks(body, current_app.config["BULK_BATCH_SIZE"])
+    updated = bulk_update_orders(chunks, values)
+    return jsonify({"updated": updated}), 200
+
+
+@orders_bp.route("", methods=["DELETE"])
+def bulk_delete():
+    """Delete many orders. Body: {"ids": [...]} or {"filter": {...}}."""
+    body = request.get_json(silent=True)
+    error = bulk_target_error(body)
+    if error:
+        return jsonify({"error": error}), 400
+
+    chunks = bulk_target_chunks(body, current_app.config["BULK_BATCH_SIZE"])
+    deleted = bulk_delete_orders(chunks)
+    return jsonify({"deleted": deleted}), 200
 
 
 @orders_bp.route("/summary", methods=["GET"])
+@conditional("orders")
 def orders_summary():
     # invoices directory check
     # return return_problem()
@@ -205,11 +644,30 @@ def update_order(order_id):
     # invoices directory check
     # return return_problem()
 
+    data = request.json
+    result = run_in_transaction(apply_order_update, order_id, data)
+    if result is None:
+        return jsonify({"error": "Order not found"}), 404
+
+    invalidate_orders(*result)
+
+    fields, expand = parse_order_view(request.args)
+    order = load_order(order_id, expand)
+    return jsonify(order_to_dict(order, fields, expand)), 200
+
+def apply_order_update(order_id, data):
+    """
+    Apply an update payload to one order and keep the rollup in step.
+    Returns the (old, new) createdAt, or None if the order is missing.
+    """
     order = Order.query.get(order_id)
     if not order:
-        return jsonify({"error": "Order not found"}), 404
+        return None
 
-    data = request.json
+    # Take the order's current contribution out of the daily rollup; the
+    # updated values are added back below, in the same transaction
+    apply_orders_delta(Order.id == order_id, -1)
+    old_created_at = order.createdAt
 
     # Update editable fields if present in payload
     if "week" in data:
@@ -244,12 +702,17 @@ def update_order(order_id):
         order.createdAt = eat_dt.astimezone(timezone.utc)
 
     # Recalculate totalCost if product or pages changed
-    if order.product:
-        order.totalCost = order.product.pricePerUnit * order.pagesOrSlides
-
-    db.session.commit()
+    product = get_dimensions().get_product(order.productId)
+    price = product["pricePerUnit"] if product else (
+        order.product.pricePerUnit if order.product else None
+    )
+    if price is not None:
+        order.totalCost = price * order.pagesOrSlides
 
-    return jsonify(order_to_dict(order)), 200
+    db.session.flush()
+    apply_orders_delta(Order.id == order_id)
+    bump_version("orders")
+    return old_created_at, order.createdAt
 
 @orders_bp.route("/<order_id>", methods=["DELETE"])
 def delete_order(order_id):
@@ -259,11 +722,20 @@ def delete_order(order_id):
     # invoices directory check
     # return return_problem()
     
-    order = Order.query.get(order_id)
-    if not order:
+    def remove():
+        order = Order.query.get(order_id)
+        if not order:
+            return None
+        apply_orders_delta(Order.id == order_id, -1)
+        created_at = order.createdAt
+        db.session.delete(order)
+        bump_version("orders")
+        adjust_row_count("orders", -1)
+        return created_at
+
+    created_at = run_in_transaction(remove)
+    if created_at is None:
         return jsonify({"error": "Order not found"}), 404
-
-    db.session.delete(order)
-    db.session.commit()
+    invalidate_orders(created_at)
 
     return jsonify({"message": f"Order {order_id} deleted successfully"}), 200
@@ -1,11 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from sqlalchemy import or_, desc, asc
 from datetime import datetime
 
 from app.models import db, Product
+from app.dimensions import dimensions_changed
+from app.counts import filter_signature, list_total
+from app.etags import conditional
+from app.serializers import isoformat_many, rows_to_dicts
+from app.transactions import run_in_transaction
+from app.services import parse_eat_datetime, reprice_product
 
 products_bp = Blueprint("products", __name__, url_prefix="/api/v1/products")
 
+# List pages serialize these columns straight from Row tuples
+PRODUCT_COLUMNS = (
+    Product.id, Product.name, Product.pricePerUnit, Product.createdAt, Product.updatedAt,
+)
+PRODUCT_CONVERTERS = {"createdAt": isoformat_many, "updatedAt": isoformat_many}
+PRODUCT_FILTERS = ("search", "startDate", "endDate")
+
 def return_problem():
     print(
             f"[ERROR] Could not mount or find a directory matching the invoice_dir directory: invoices_dir"
@@ -21,6 +34,7 @@ def return_problem():
 # List products with filters, pagination, sorting
 # -------------------------
 @products_bp.route("", methods=["GET"])
+@conditional("products")
 def get_products():
     page = int(request.args.get("page", 1))
     # page = 1
@@ -34,7 +48,7 @@ def get_products():
     # invoices directory check
     # return return_problem()
 
-    query = Product.query
+    query = db.session.query(*PRODUCT_COLUMNS)
 
     # Search filter
     if search:
@@ -54,15 +68,21 @@ def get_products():
     sort_column = getattr(Product, sort_by, Product.createdAt)
     query = query.order_by(desc(sort_column) if sort_order == "desc" else asc(sort_column))
 
-    pagination = query.paginate(page=page, per_page=page_size, error_out=False)
+    pagination = query.paginate(page=page, per_page=page_size, error_out=False, count=False)
+    pagination.total, estimated = list_total(
+        query, "products", filter_signature(request.args, PRODUCT_FILTERS), request.args
+    )
 
-    return jsonify({
-        "data": [serialize_product(p) for p in pagination.items],
+    body = {
+        "data": rows_to_dicts(pagination.items, PRODUCT_CONVERTERS),
         "total": pagination.total,
         "page": page,
         "pageSize": page_size,
         "totalPages": pagination.pages
-    })
+    }
+    if estimated:
+        body["totalEstimated"] = True
+    return jsonify(body)
 
 
 # -------------------------
@@ -70,6 +90,7 @@ def get_products():
 # Get single product
 # -------------------------
 @products_bp.route("/<string:id>", methods=["GET"])
+@conditional("products")
 def get_product(id):
     # invoices directory check
     # return return_problem()
@@ -90,13 +111,16 @@ def create_product():
     if not all(k in data for k in ("productId", "name", "pricePerUnit")):
         return error_response("VALIDATION_ERROR", "Missing required fields")
 
-    product = Product(
-        name=data["name"],
-        pricePerUnit=float(data["pricePerUnit"])
-    )
+    def write():
+        product = Product(
+            name=data["name"],
+            pricePerUnit=float(data["pricePerUnit"])
+        )
+        db.session.add(product)
+        dimensions_changed("products")
+        return product
 
-    db.session.add(product)
-    db.session.commit()
+    product = run_in_transaction(write)
 
     return jsonify(serialize_product(product)), 201
 
@@ -109,13 +133,16 @@ def create_product():
 def update_product(id):
     # invoices directory check
     # return return_problem()
-    product = Product.query.get_or_404(id)
     data = request.json
 
-    product.name = data.get("name", product.name)
-    product.pricePerUnit = data.get("pricePerUnit", product.pricePerUnit)
+    def write():
+        product = Product.query.get_or_404(id)
+        product.name = data.get("name", product.name)
+        product.pricePerUnit = data.get("pricePerUnit", product.pricePerUnit)
+        dimensions_changed("products")
+        return product
 
-    db.session.commit()
+    product = run_in_transaction(write)
     return jsonify(serialize_product(product))
 
 
@@ -127,12 +154,45 @@ def update_product(id):
 def delete_product(id):
     # invoices directory check
     # return return_problem()
-    product = Product.query.get_or_404(id)
-    db.session.delete(product)
-    db.session.commit()
+    def write():
+        product = Product.query.get_or_404(id)
+        db.session.delete(product)
+        dimensions_changed("products")
+
+    run_in_transaction(write)
     return jsonify({"message": "Product deleted successfully"}), 200
 
 
+# -------------------------
+# POST /products/:id/reprice
+# Recompute stored order totals at the current price
+# -------------------------
+@products_bp.route("/<string:id>/reprice", methods=["POST"])
+def reprice(id):
+    # invoices directory check
+    # return return_problem()
+    data = request.get_json(silent=True) or {}
+
+    try:
+        start = parse_eat_datetime(data["startDate"]) if data.get("startDate") else None
+        end = parse_eat_datetime(data["endDate"]) if data.get("endDate") else None
+    except ValueError:
+        return error_response("VALIDATION_ERROR", "Invalid startDate or endDate")
+
+    try:
+        result = reprice_product(
+            id,
+            start=start,
+            end=end,
+            dry_run=bool(data.get("dryRun")),
+            chunk_size=current_app.config["REPRICE_CHUNK_SIZE"],
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 404
+
+    return jsonify(result)
+
+
 # -------------------------
 # Helpers
 # -------------------------
@@ -0,0 +1,78 @@
+from sqlalchemy import false, literal, or_, select, union_all, text
+
+from app.models import db, Order, Class, Genre, Client, Product
+
+# Trigram (GIN) indexes that let ILIKE '%term%' on the dimension tables
+# use an index. The syntax is accepted by both PostgreSQL (pg_trgm) and
+# CockroachDB.
+TRIGRAM_INDEXES = [
+    ("ix_classes_name_trgm", "classes", "name"),
+    ("ix_genres_name_trgm", "genres", "name"),
+    ("ix_products_name_trgm", "products", "name"),
+    ("ix_clients_clientName_trgm", "clients", "clientName"),
+    ("ix_clients_institution_trgm", "clients", "institution"),
+]
+
+
+def match_dimension_ids(term):
+    """
+    Resolve a search term to the ids of the classes, genres, clients
+    (by name or institution) and products whose names contain it.
+
+    One round trip over the small dimension tables, each lookup served by
+    a trigram index. Returns a dict of kind -> list of ids.
+    """
+    pattern = f"%{term}%"
+    stmt = union_all(
+        select(literal("class").label("kind"), Class.id).where(Class.name.ilike(pattern)),
+        select(literal("genre"), Genre.id).where(Genre.name.ilike(pattern)),
+        select(literal("client"), Client.id).where(or_(
+            Client.clientName.ilike(pattern),
+            Client.institution.ilike(pattern),
+        )),
+        select(literal("product"), Product.id).where(Product.name.ilike(pattern)),
+    )
+
+    matches = {"class": [], "genre": [], "client": [], "product": []}
+    for kind, id_ in db.session.execute(stmt):
+        matches[kind].append(id_)
+    return matches
+
+
+def order_search_condition(term):
+    """
+    WHERE clause for orders whose class, genre, client or product matches
+    ``term``, as plain ``IN`` predicates on the indexed foreign keys
+    instead of correlated EXISTS subqueries per order.
+    """
+    matches = match_dimension_ids(term)
+    columns = {
+        "class": Order.classId,
+        "genre": Order.genreId,
+        "client": Order.clientId,
+        "product": Order.productId,
+    }
+
+    conditions = [
+        columns[kind].in_(ids) for kind, ids in matches.items() if ids
+    ]
+    if not conditions:
+        return false()
+    return or_(*conditions)
+
+
+def create_search_indexes():
+    """Create the order foreign key indexes and the trigram name indexes."""
+    connection = db.session.connection()
+
+    for index in Order.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    for name, table, column in TRIGRAM_INDEXES:
+        connection.execute(text(
+            f'CREATE INDEX IF NOT EXISTS "{name}" '
+            f'ON {table} USING GIN ("{column}" gin_trgm_ops)'
+        ))
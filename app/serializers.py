@@ -0,0 +1,114 @@
+"""
+JSON encoding for responses, and helpers that turn pages of SQLAlchemy
+Row tuples into plain dicts a column at a time.
+
+With JSON_ENCODER=auto (the default) responses are encoded by orjson when
+it is installed, and by Flask's stdlib encoder otherwise. Output is the
+same JSON either way: keys sorted, dates as HTTP dates, compact unless in
+debug; only non-ASCII text is sent as UTF-8 rather than \\u escapes.
+"""
+from datetime import timedelta, timezone
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+EAT = timezone(timedelta(hours=3))
+EAT_OFFSET = timedelta(hours=3)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson. Anything orjson cannot
+    encode the same way as the stdlib (huge ints, custom ``__html__``
+    objects, ...) falls back to the default provider.
+    """
+
+    def _options(self):
+        # Dates go through self.default (HTTP dates) as with the stdlib
+        options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps_bytes(self, obj, newline=False):
+        """``obj`` as compact UTF-8 JSON bytes."""
+        options = self._options()
+        if newline:
+            options |= orjson.OPT_APPEND_NEWLINE
+        try:
+            return orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:
+            text = super().dumps(obj, separators=(",", ":"), ensure_ascii=False)
+            return (text + "\n" if newline else text).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs and kwargs != {"separators": (",", ":")}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def response(self, *args, **kwargs):
+        if self._pretty():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.dumps_bytes(obj, newline=True), mimetype=self.mimetype
+        )
+
+
+def init_json(app):
+    """Install the JSON provider chosen by JSON_ENCODER (auto, orjson or stdlib)."""
+    choice = app.config["JSON_ENCODER"]
+    if choice == "orjson" and orjson is None:
+        raise RuntimeError("JSON_ENCODER=orjson but orjson is not installed")
+    if choice != "stdlib" and orjson is not None:
+        app.json = FastJSONProvider(app)
+
+
+# ---- Row pages ----
+
+def isoformat_many(values):
+    """``isoformat()`` of each datetime in a column, None kept as None."""
+    return [v.isoformat() if v is not None else None for v in values]
+
+
+def eat_isoformat_many(values):
+    """
+    The column version of ``to_eat``: naive values are UTC and come back
+    as EAT ISO strings. Shifting the naive value and appending the offset
+    gives the same string as converting through tz-aware datetimes.
+    """
+    out = []
+    for v in values:
+        if v is None:
+            out.append(None)
+        elif v.tzinfo is None:
+            out.append((v + EAT_OFFSET).isoformat() + "+03:00")
+        else:
+            out.append(v.astimezone(EAT).isoformat())
+    return out
+
+
+def rows_to_dicts(rows, converters=None):
+    """
+    Dicts keyed by the Row labels. ``converters`` maps a label to a
+    function applied to that whole column at once (see isoformat_many).
+    """
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    columns = list(zip(*rows))
+    for i, key in enumerate(keys):
+        if converters and key in converters:
+            columns[i] = converters[key](columns[i])
+    return [dict(zip(keys, values)) for values in zip(*columns)]
@@ -1,5 +1,11 @@
-from app.models import db, Client, Product, Order
+from app.models import db, Client, Product, Order, Class, Genre, generate_uuid
+from app.rollup import EAT_DAY, apply_orders_delta, apply_rollup_delta
+from app.cache import invalidate_orders
+from app.counts import adjust_row_count
+from app.dimensions import bump_version, get_dimensions
+from app.transactions import run_in_transaction
 from datetime import datetime
+from sqlalchemy import delete, func, insert, literal, select, update
 
 def calculate_total_cost(product_price, quantity):
     return product_price * quantity
@@ -9,12 +15,12 @@ from datetime import datetime, timezone, timedelta
 EAT = timezone(timedelta(hours=3))
 
 def create_order(data):
-    product = Product.query.get(data['productId'])
+    product = get_dimensions().get_product(data['productId'])
     if not product:
         raise ValueError("Product not found")
 
     total_cost = calculate_total_cost(
-        product.pricePerUnit,
+        product["pricePerUnit"],
         data['pagesOrSlides']
     )
 
@@ -30,22 +36,405 @@ def create_order(data):
         # Convert to UTC for storage
         created_at = eat_dt.astimezone(timezone.utc)
 
-    order = Order(
-        clientId=data['clientId'],
-        productId=data['productId'],
-        classId=data.get('orderClass'),
-        genreId=data.get('genre'),
-        week=data.get('week'),
-        pagesOrSlides=data['pagesOrSlides'],
-        totalCost=total_cost,
-        description=data.get('description'),
-        createdAt=created_at  # UTC
-    )
+    def write():
+        order = Order(
+            clientId=data['clientId'],
+            productId=data['productId'],
+            classId=data.get('orderClass'),
+            genreId=data.get('genre'),
+            week=data.get('week'),
+            pagesOrSlides=data['pagesOrSlides'],
+            totalCost=total_cost,
+            description=data.get('description'),
+            createdAt=created_at  # UTC
+        )
+
+        db.session.add(order)
+        db.session.flush()
+        apply_orders_delta(Order.id == order.id)
+        bump_version("orders")
+        adjust_row_count("orders", 1)
+        return order, order.createdAt
+
+    order, stored_at = run_in_transaction(write)
 
-    db.session.add(order)
-    db.session.commit()
+    invalidate_orders(stored_at)
     return order
 
+def _ref_id(value):
+    """orderClass / genre may be sent as an id or as {"id": ...}"""
+    if isinstance(value, dict):
+        value = value.get("id")
+    return value or None
+
+def validate_bulk_rows(rows):
+    """
+    Check every row against the referenced products, clients, classes and
+    genres, resolved up front in set-based lookups.
+
+    Returns (orders, errors): insert-ready dicts for the valid rows and
+    a list of {"row": index, "errors": {field: message}}.
+    """
+    dims = get_dimensions()
+
+    client_ids = {r.get("clientId") for r in rows if isinstance(r, dict) and r.get("clientId")}
+    known_clients = set()
+    if client_ids:
+        known_clients = {
+            cid for (cid,) in db.session.query(Client.id).filter(Client.id.in_(client_ids))
+        }
+
+    now = datetime.now(timezone.utc)
+    orders, errors = [], []
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"row": index, "errors": {"_row": "Expected an object"}})
+            continue
+
+        problems = {}
+
+        client_id = row.get("clientId")
+        if not client_id:
+            problems["clientId"] = "Required"
+        elif client_id not in known_clients:
+            problems["clientId"] = "Client not found"
+
+        product = None
+        if not row.get("productId"):
+            problems["productId"] = "Required"
+        else:
+            product = dims.get_product(row["productId"])
+            if not product:
+                problems["productId"] = "Product not found"
+
+        pages = row.get("pagesOrSlides")
+        try:
+            # int() would silently truncate 2.5 or turn True into 1
+            if isinstance(pages, bool) or (isinstance(pages, float) and not pages.is_integer()):
+                raise ValueError
+            pages = int(pages)
+            if pages < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            problems["pagesOrSlides"] = "Must be a non-negative integer"
+
+        class_id = _ref_id(row.get("orderClass"))
+        if class_id and not dims.get_class(class_id):
+            problems["orderClass"] = "Class not found"
+
+        genre_id = _ref_id(row.get("genre"))
+        if genre_id and not dims.get_genre(genre_id):
+            problems["genre"] = "Genre not found"
+
+        created_at = now
+        if row.get("orderDate"):
+            try:
+                eat_dt = datetime.fromisoformat(row["orderDate"])
+                if eat_dt.tzinfo is None:
+                    eat_dt = eat_dt.replace(tzinfo=EAT)
+                created_at = eat_dt.astimezone(timezone.utc)
+            except (TypeError, ValueError):
+                problems["orderDate"] = "Invalid ISO date"
+
+        if problems:
+            errors.append({"row": index, "errors": problems})
+            continue
+
+        orders.append({
+            "id": generate_uuid(),
+            "clientId": client_id,
+            "productId": row["productId"],
+            "classId": class_id,
+            "genreId": genre_id,
+            "week": row.get("week") or None,
+            "pagesOrSlides": pages,
+            "totalCost": calculate_total_cost(product["pricePerUnit"], pages),
+            "description": row.get("description") or None,
+            "createdAt": created_at,
+            "updatedAt": now,
+        })
+
+    return orders, errors
+
+class BulkInsertFailed(Exception):
+    """A bulk insert failed after the orders in ``committed`` were saved."""
+
+    def __init__(self, committed):
+        super().__init__(f"Bulk insert failed after {len(committed)} rows were saved")
+        self.committed = committed
+
+def bulk_create_orders(orders, batch_size=500, atomic=False):
+    """
+    Insert validated order dicts with multi-row INSERTs of ``batch_size``
+    rows, updating the daily rollup per batch. Each batch commits on its
+    own unless ``atomic`` is set, in which case everything is one
+    transaction. If a batch fails, BulkInsertFailed carries the orders
+    committed before it.
+    """
+    def write(batches):
+        for batch in batches:
+            db.session.execute(insert(Order), batch)
+            apply_orders_delta(Order.id.in_([o["id"] for o in batch]))
+            adjust_row_count("orders", len(batch))
+        bump_version("orders")
+
+    batches = [
+        orders[start:start + batch_size]
+        for start in range(0, len(orders), batch_size)
+    ]
+    committed = []
+    try:
+        if atomic:
+            run_in_transaction(write, batches)
+            committed = orders
+        else:
+            for batch in batches:
+                run_in_transaction(write, [batch])
+                committed.extend(batch)
+    except Exception as e:
+        db.session.rollback()
+        raise BulkInsertFailed(committed) from e
+    finally:
+        timestamps = [o["createdAt"] for o in committed]
+        if len(timestamps) > 100:
+            invalidate_orders()
+        elif timestamps:
+            invalidate_orders(*timestamps)
+
+    return len(committed)
+
+def resolve_bulk_changes(changes):
+    """
+    Validate the ``set`` object of a bulk update and map it to column
+    values. Returns (values, errors).
+    """
+    dims = get_dimensions()
+    values, errors = {}, {}
+
+    if "week" in changes:
+        values["week"] = changes["week"]
+    if "description" in changes:
+        values["description"] = changes["description"]
+
+    if "clientId" in changes:
+        if not db.session.query(Client.id).filter(Client.id == changes["clientId"]).first():
+            errors["clientId"] = "Client not found"
+        values["clientId"] = changes["clientId"]
+
+    if "productId" in changes:
+        if not dims.get_product(changes["productId"]):
+            errors["productId"] = "Product not found"
+        values["productId"] = changes["productId"]
+
+    if "orderClass" in changes:
+        class_id = _ref_id(changes["orderClass"])
+        if class_id and not dims.get_class(class_id):
+            errors["orderClass"] = "Class not found"
+        values["classId"] = class_id
+
+    if "genre" in changes:
+        genre_id = _ref_id(changes["genre"])
+        if genre_id and not dims.get_genre(genre_id):
+            errors["genre"] = "Genre not found"
+        values["genreId"] = genre_id
+
+    if "pagesOrSlides" in changes:
+        try:
+            values["pagesOrSlides"] = int(changes["pagesOrSlides"])
+            if values["pagesOrSlides"] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errors["pagesOrSlides"] = "Must be a non-negative integer"
+
+    if "orderDate" in changes:
+        try:
+            eat_dt = datetime.fromisoformat(changes["orderDate"])
+            if eat_dt.tzinfo is None:
+                eat_dt = eat_dt.replace(tzinfo=EAT)
+            values["createdAt"] = eat_dt.astimezone(timezone.utc)
+        except (TypeError, ValueError):
+            errors["orderDate"] = "Invalid ISO date"
+
+    return values, errors
+
+def bulk_update_orders(id_chunks, values):
+    """
+    Apply ``values`` to every order in ``id_chunks`` (an iterable of id
+    lists) with one UPDATE per chunk, each chunk in its own transaction.
+    totalCost is recomputed in the same statement from the products table
+    when productId or pagesOrSlides change. Returns the number of rows
+    updated.
+    """
+    stmt = update(Order).values(**values)
+    if "productId" in values or "pagesOrSlides" in values:
+        product_id = values.get("productId", Order.productId)
+        pages = values.get("pagesOrSlides", Order.pagesOrSlides)
+        stmt = stmt.values(totalCost=Product.pricePerUnit * pages).where(
+            Product.id == product_id
+        )
+
+    def write(ids):
+        apply_orders_delta(Order.id.in_(ids), -1)
+        result = db.session.execute(
+            stmt.where(Order.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        )
+        apply_orders_delta(Order.id.in_(ids))
+        bump_version("orders")
+        return result.rowcount
+
+    updated = 0
+    for ids in id_chunks:
+        updated += run_in_transaction(write, ids)
+
+    invalidate_orders()
+    return updated
+
+def bulk_delete_orders(id_chunks):
+    """Delete the orders in ``id_chunks``, one DELETE and transaction per chunk."""
+    def write(ids):
+        apply_orders_delta(Order.id.in_(ids), -1)
+        result = db.session.execute(
+            delete(Order).where(Order.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        )
+        bump_version("orders")
+        adjust_row_count("orders", -result.rowcount)
+        return result.rowcount
+
+    deleted = 0
+    for ids in id_chunks:
+        deleted += run_in_transaction(write, ids)
+
+    invalidate_orders()
+    return deleted
+
+def parse_eat_datetime(value):
+    """Parse an ISO date sent by the frontend (EAT unless stated) to UTC"""
+    eat_dt = datetime.fromisoformat(value)
+    if eat_dt.tzinfo is None:
+        eat_dt = eat_dt.replace(tzinfo=EAT)
+    return eat_dt.astimezone(timezone.utc)
+
+def reprice_product(product_id, start=None, end=None, chunk_size=5000,
+                    dry_run=False, progress=None):
+    """
+    Recompute totalCost = pricePerUnit * pagesOrSlides for a product's
+    orders, optionally limited to start <= createdAt <= end (UTC).
+
+    Orders are processed in id-ordered chunks. Each chunk is one
+    UPDATE orders ... FROM products plus its rollup delta, in its own
+    transaction, so no order is ever loaded into Python. Only orders whose
+    cost actually changes are written. ``progress(chunks, updated, delta)``
+    is called after every chunk.
+
+    With ``dry_run`` nothing is written; the number of orders that would
+    change and the revenue delta come from a single aggregate query.
+    """
+    product = db.session.get(Product, product_id)
+    if not product:
+        raise ValueError("Product not found")
+
+    conditions = [Order.productId == product_id, Product.id == Order.productId]
+    if start is not None:
+        conditions.append(Order.createdAt >= start)
+    if end is not None:
+        conditions.append(Order.createdAt <= end)
+
+    new_cost = Product.pricePerUnit * Order.pagesOrSlides
+    changed = Order.totalCost != new_cost
+
+    result = {
+        "productId": product_id,
+        "pricePerUnit": product.pricePerUnit,
+        "dryRun": dry_run,
+    }
+
+    if dry_run:
+        row = db.session.execute(
+            select(
+                func.count(),
+                func.count().filter(changed),
+                func.coalesce(func.sum(new_cost - Order.totalCost), 0),
+            )
+            .select_from(Order)
+            .join(Product, Product.id == Order.productId)
+            .where(*conditions)
+        ).one()
+        result.update(matched=row[0], updated=row[1], revenueDelta=float(row[2]))
+        return result
+
+    def write_chunk(last_id):
+        # Upper id bound of the next chunk; only the bound comes back
+        window = select(Order.id).where(Order.productId == product_id)
+        if start is not None:
+            window = window.where(Order.createdAt >= start)
+        if end is not None:
+            window = window.where(Order.createdAt <= end)
+        if last_id is not None:
+            window = window.where(Order.id > last_id)
+        window = window.order_by(Order.id).limit(chunk_size).subquery()
+        upper = db.session.execute(select(func.max(window.c.id))).scalar()
+        if upper is None:
+            return None, None
+
+        chunk = conditions + [Order.id <= upper]
+        if last_id is not None:
+            chunk.append(Order.id > last_id)
+
+        delta = db.session.execute(
+            select(func.count(), func.coalesce(func.sum(new_cost - Order.totalCost), 0))
+            .select_from(Order)
+            .join(Product, Product.id == Order.productId)
+            .where(*chunk, changed)
+        ).one()
+
+        if delta[0]:
+            apply_rollup_delta(
+                select(
+                    EAT_DAY,
+                    Order.clientId,
+                    Order.productId,
+                    func.sum(new_cost - Order.totalCost),
+                    literal(0),
+                )
+                .select_from(Order)
+                .join(Product, Product.id == Order.productId)
+                .where(*chunk, changed)
+                .group_by(EAT_DAY, Order.clientId, Order.productId)
+            )
+            db.session.execute(
+                update(Order)
+                .where(*chunk, changed)
+                .values(totalCost=new_cost),
+                execution_options={"synchronize_session": False},
+            )
+            bump_version("orders")
+        return upper, delta
+
+    chunks = updated = 0
+    revenue_delta = 0.0
+    last_id = None
+
+    while True:
+        upper, delta = run_in_transaction(write_chunk, last_id)
+        if upper is None:
+            break
+
+        chunks += 1
+        updated += delta[0]
+        revenue_delta += float(delta[1])
+        last_id = upper
+        if progress:
+            progress(chunks, updated, revenue_delta)
+
+    if updated:
+        invalidate_orders()
+
+    result.update(updated=updated, chunks=chunks, revenueDelta=revenue_delta)
+    return result
+
 def generate_invoice(client_id, start_date, end_date):
     orders = Order.query.filter(
         Order.clientId == client_id,
@@ -65,70 +454,109 @@ def generate_invoice(client_id, start_date, end_date):
     }
 
 
-import pandas as pd
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-
-def generate_invoice_excel(invoice_data):
-    """Generate Excel file for invoice"""
-    df = pd.DataFrame([{
-        "Product": o.product.name,
-        "Pages/Slides": o.pagesOrSlides,
-        "Price Per Unit": o.product.pricePerUnit,
-        "Total Cost": o.totalCost,
-        "Week": o.week,
-        "Genre": o.order_genre.name if o.order_genre else None,
-        "Class": o.order_class.name if o.order_class else None,
-        "Date": o.createdAt.strftime("%Y-%m-%d")
-    } for o in invoice_data['orders']])
+from app.exports import get_renderer
+from app import metrics
 
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Invoice')
-        # Add summary row
-        summary_df = pd.DataFrame([{"Total Amount": invoice_data['totalAmount']}])
-        summary_df.to_excel(writer, index=False, sheet_name='Summary')
-    output.seek(0)
-    return output
-
-def generate_invoice_pdf(invoice_data):
-    """Generate PDF file for invoice"""
-    output = BytesIO()
-    c = canvas.Canvas(output, pagesize=A4)
-    width, height = A4
-    y = height - 50
-
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(50, y, f"Invoice for {invoice_data['client'].clientName}")
-    y -= 30
-    c.setFont("Helvetica", 12)
-    c.drawString(50, y, f"Institution: {invoice_data['client'].institution}")
-    y -= 20
-    c.drawString(50, y, f"Period: {invoice_data['startDate'].date()} - {invoice_data['endDate'].date()}")
-    y -= 30
-
-    # Table header
-    headers = ["Order ID", "Product", "Pages/Slides", "Price/Unit", "Total Cost"]
-    x_positions = [50, 150, 300, 400, 500]
-    for i, h in enumerate(headers):
-        c.drawString(x_positions[i], y, h)
-    y -= 20
-
-    # Table rows
-    for o in invoice_data['orders']:
-        values = [o.product.name, str(o.pagesOrSlides), f"{o.product.pricePerUnit:.2f}", f"{o.totalCost:.2f}"]
-        for i, val in enumerate(values):
-            c.drawString(x_positions[i], y, val)
-        y -= 20
-        if y < 50:  # new page if needed
-            c.showPage()
-            y = height - 50
-
-    y -= 20
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, f"Total Amount: {invoice_data['totalAmount']:.2f}")
-    c.save()
-    output.seek(0)
-    return output
+def iter_invoice_rows(client_id, start_date, end_date, batch_size=1000):
+    """
+    Stream the invoice lines for a client and period as plain tuples:
+    (product, pagesOrSlides, pricePerUnit, totalCost, week, genre, class,
+    createdAt). Rows come from a server-side cursor in batches of
+    ``batch_size``, so only one batch is ever held in memory.
+    """
+    stmt = (
+        select(
+            Product.name,
+            Order.pagesOrSlides,
+            Product.pricePerUnit,
+            Order.totalCost,
+            Order.week,
+            Genre.name,
+            Class.name,
+            Order.createdAt,
+        )
+        .join(Product, Product.id == Order.productId)
+        .outerjoin(Genre, Genre.id == Order.genreId)
+        .outerjoin(Class, Class.id == Order.classId)
+        .where(
+            Order.clientId == client_id,
+            Order.createdAt >= start_date,
+            Order.createdAt <= end_date,
+        )
+        .order_by(Order.createdAt, Order.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in db.session.execute(stmt):
+        yield tuple(row)
+
+def iter_period_invoice_rows(start_date, end_date, batch_size=5000):
+    """
+    Stream the invoice lines of every client for a period in one pass,
+    ordered by client, as (clientId, clientName, institution, row) where
+    ``row`` has the shape produced by ``iter_invoice_rows``.
+    """
+    stmt = (
+        select(
+            Order.clientId,
+            Client.clientName,
+            Client.institution,
+            Product.name,
+            Order.pagesOrSlides,
+            Product.pricePerUnit,
+            Order.totalCost,
+            Order.week,
+            Genre.name,
+            Class.name,
+            Order.createdAt,
+        )
+        .join(Client, Client.id == Order.clientId)
+        .join(Product, Product.id == Order.productId)
+        .outerjoin(Genre, Genre.id == Order.genreId)
+        .outerjoin(Class, Class.id == Order.classId)
+        .where(Order.createdAt >= start_date, Order.createdAt <= end_date)
+        .order_by(Order.clientId, Order.createdAt, Order.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in db.session.execute(stmt):
+        yield row[0], row[1], row[2], tuple(row[3:])
+
+def with_progress(rows, progress, every=500):
+    """Pass rows through, calling ``progress(rows_so_far)`` every ``every`` rows and at the end"""
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % every == 0:
+            progress(done)
+    progress(done)
+
+def generate_invoice_excel(out, client_id, start_date, end_date, progress=None):
+    """Write the Excel invoice for a client and period to ``out``"""
+    write_invoice_excel = get_renderer("excel")
+    rows = iter_invoice_rows(client_id, start_date, end_date)
+    if progress:
+        rows = with_progress(rows, progress)
+    with metrics.timer("export_render_seconds", {"format": "excel"}):
+        return write_invoice_excel(out, rows)
+
+def generate_invoice_pdf(client_id, start_date, end_date, progress=None):
+    """Return the PDF invoice for a client and period as an iterator of page chunks"""
+    client = Client.query.get(client_id)
+    if not client:
+        raise ValueError("Client not found")
+
+    heading = {
+        "clientName": client.clientName,
+        "institution": client.institution,
+        "startDate": start_date,
+        "endDate": end_date,
+    }
+    iter_invoice_pdf = get_renderer("pdf")
+    rows = iter_invoice_rows(client_id, start_date, end_date)
+    if progress:
+        rows = with_progress(rows, progress)
+    return metrics.timed_chunks(
+        "export_render_seconds",
+        iter_invoice_pdf(heading, rows),
+        {"format": "pdf"},
+    )
@@ -0,0 +1,70 @@
+import random
+import time
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.models import db
+
+# serialization_failure (CockroachDB's "restart transaction") and
+# deadlock_detected; both leave the database untouched and are safe to retry
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+def is_retryable(exc):
+    orig = getattr(exc, "orig", None)
+    # psycopg 3 exposes .sqlstate, psycopg2 .pgcode
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return code in RETRYABLE_SQLSTATES
+
+
+def run_in_transaction(work, *args, **kwargs):
+    """
+    Call ``work(*args, **kwargs)`` and commit, retrying the whole unit
+    when the database reports a serialization failure.
+
+    ``work`` must do all of its reads and writes inside the call (load
+    rows again rather than reuse objects from an earlier attempt) and
+    must not commit itself. Side effects that should happen once, such
+    as cache invalidation, belong after this returns. Returns whatever
+    ``work`` returns.
+    """
+    if has_app_context():
+        attempts = current_app.config["DB_RETRY_ATTEMPTS"]
+        backoff = current_app.config["DB_RETRY_BACKOFF"]
+    else:
+        attempts, backoff = 5, 0.05
+
+    for attempt in range(1, attempts + 1):
+        try:
+            result = work(*args, **kwargs)
+            db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if attempt >= attempts or not is_retryable(e):
+                raise
+            # Exponential backoff with jitter so contending writers spread out
+            time.sleep(backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+
+
+def follower_reads():
+    """
+    Run the rest of the current read-only transaction as a follower read
+    when ANALYTICS_FOLLOWER_READS is set and the database is CockroachDB,
+    unless the request must see recent writes (``g.fresh_reads``, set by
+    cached_response). Must be called before the transaction's first query.
+    """
+    if not current_app.config["ANALYTICS_FOLLOWER_READS"]:
+        return
+    if db.engine.dialect.name != "cockroachdb":
+        return
+    if g.get("fresh_reads"):
+        return
+
+    if db.session.in_transaction():
+        # Only reads can have happened so far; start a fresh transaction
+        db.session.rollback()
+    db.session.execute(text("SET TRANSACTION AS OF SYSTEM TIME follower_read_timestamp()"))
+    g.follower_read = True
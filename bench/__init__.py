@@ -0,0 +1,4 @@
+"""
+Performance tooling. Run modules from the repository root, e.g.
+``python -m bench.startup``.
+"""
@@ -0,0 +1,294 @@
+"""
+Benchmark the API endpoints through the Flask test client against the
+database in DATABASE_URL (fill it with ``python -m bench.generate``).
+
+For every scenario it records p50/p95/p99 latency, SQL statements per
+request and peak Python memory per request (from a separate tracemalloc
+pass so tracing does not skew the timings).
+
+    DATABASE_URL=... python -m bench.endpoints --iterations 50 \\
+        --output bench-$(git rev-parse --short HEAD).json
+    DATABASE_URL=... python -m bench.endpoints --compare bench-abc123.json \\
+        --max-regression 20
+
+Response and invoice caches are bypassed unless --warm-caches is given,
+so the numbers measure the work an uncached request does. Prints a JSON
+report; with --compare, exits non-zero when a scenario's p50 regressed
+by more than --max-regression percent.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class Scenario:
+    def __init__(self, name, path, method="GET", body=None, cleanup=None):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.body = body
+        self.cleanup = cleanup
+
+
+def build_scenarios(fixtures):
+    """Requests covering every blueprint, parameterised with real ids."""
+    top_client = fixtures["topClient"]
+    product = fixtures["product"]
+    today = datetime.now().date()
+    quarter_ago = today - timedelta(days=90)
+
+    created = []
+
+    def delete_created(client):
+        if created:
+            client.delete("/api/v1/orders", json={"ids": created})
+            created.clear()
+
+    def order_body():
+        return {"clientId": top_client, "productId": product, "pagesOrSlides": 3}
+
+    return [
+        Scenario("orders.list", "/api/v1/orders?page=1&pageSize=20"),
+        Scenario("orders.list_page_200", "/api/v1/orders?page=200&pageSize=20"),
+        Scenario("orders.cursor", "/api/v1/orders?cursor=&pageSize=20"),
+        Scenario("orders.filter_client",
+                 f"/api/v1/orders?clientId={top_client}&startDate={quarter_ago}&endDate={today}"),
+        Scenario("orders.search", "/api/v1/orders?search=Research"),
+        Scenario("orders.summary", "/api/v1/orders/summary"),
+        Scenario("orders.create", "/api/v1/orders", "POST", order_body,
+                 cleanup=delete_created),
+        Scenario("analytics.dashboard", "/api/v1/analytics/dashboard?period=month&trendPeriod=3months"),
+        Scenario("analytics.comparison", "/api/v1/analytics/earnings/comparison?period=year"),
+        Scenario("analytics.revenue_trend", "/api/v1/analytics/revenue/trend?period=6months"),
+        Scenario("analytics.orders_trend", "/api/v1/analytics/orders/trend?period=3months"),
+        Scenario("analytics.client_rankings", "/api/v1/analytics/clients/earnings?period=6months"),
+        Scenario("clients.list", "/api/v1/clients?page=1&pageSize=20"),
+        Scenario("products.list", "/api/v1/products?page=1&pageSize=20"),
+        Scenario("meta.classes", "/api/v1/meta/classes"),
+        Scenario("meta.genres", "/api/v1/meta/genres"),
+        Scenario("classes.list", "/api/v1/classes?page=1&pageSize=20"),
+        Scenario("invoices.excel",
+                 f"/api/v1/invoices/download/excel?clientId={top_client}&startDate={quarter_ago}&endDate={today}"),
+        Scenario("invoices.pdf",
+                 f"/api/v1/invoices/download/pdf?clientId={top_client}&startDate={quarter_ago}&endDate={today}"),
+    ], created
+
+
+class QueryCounter:
+    """Counts every statement the engine runs, streamed responses included."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, "after_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def load_fixtures(app):
+    from sqlalchemy import func, select
+
+    from app.models import db, Order, Product
+
+    with app.app_context():
+        top_client = db.session.execute(
+            select(Order.clientId).group_by(Order.clientId)
+            .order_by(func.count().desc()).limit(1)
+        ).scalar()
+        product = db.session.execute(select(Product.id).limit(1)).scalar()
+        orders = db.session.execute(select(func.count()).select_from(Order)).scalar()
+        dialect = db.engine.dialect.name
+    if top_client is None:
+        raise SystemExit("No orders found; run python -m bench.generate first")
+    return {"topClient": top_client, "product": product, "orders": orders, "database": dialect}
+
+
+def issue(client, scenario, created):
+    body = scenario.body() if callable(scenario.body) else scenario.body
+    response = client.open(scenario.path, method=scenario.method, json=body)
+    # Drain streamed bodies so rendering is part of the measurement
+    data = response.get_data()
+    if scenario.method == "POST" and response.status_code == 201:
+        created.append(response.get_json()["id"])
+    return response.status_code, len(data)
+
+
+def clear_caches(app, invoice_dir):
+    from app.cache import get_response_cache
+
+    with app.app_context():
+        get_response_cache().invalidate()
+    for name in os.listdir(invoice_dir):
+        path = os.path.join(invoice_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def run_scenario(app, client, scenario, created, args, counter, invoice_dir):
+    def call():
+        if not args.warm_caches:
+            clear_caches(app, invoice_dir)
+        return issue(client, scenario, created)
+
+    for _ in range(args.warmup):
+        call()
+
+    timings, queries, statuses, sizes = [], [], {}, []
+    for _ in range(args.iterations):
+        before = counter.count
+        started = time.perf_counter()
+        status, size = call()
+        timings.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+        statuses[status] = statuses.get(status, 0) + 1
+        sizes.append(size)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(args.memory_iterations):
+        tracemalloc.reset_peak()
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    if scenario.cleanup:
+        scenario.cleanup(client)
+
+    timings.sort()
+    return {
+        "method": scenario.method,
+        "path": scenario.path,
+        "iterations": args.iterations,
+        "p50Ms": round(percentile(timings, 50), 2),
+        "p95Ms": round(percentile(timings, 95), 2),
+        "p99Ms": round(percentile(timings, 99), 2),
+        "meanMs": round(sum(timings) / len(timings), 2),
+        "queriesPerRequest": round(sum(queries) / len(queries), 2),
+        "peakMemoryKb": round(max(peaks) / 1024, 1) if peaks else None,
+        "responseBytes": max(sizes),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, max_regression):
+    """Per-scenario p50/p95 change against a previous report."""
+    changes, regressed = {}, []
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        entry = {}
+        for key in ("p50Ms", "p95Ms", "queriesPerRequest", "peakMemoryKb"):
+            if before.get(key) and current.get(key) is not None:
+                entry[key] = round((current[key] - before[key]) / before[key] * 100, 1)
+        changes[name] = entry
+        if max_regression is not None and entry.get("p50Ms", 0) > max_regression:
+            regressed.append(name)
+    return changes, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--memory-iterations", type=int, default=3)
+    parser.add_argument("--only", action="append", default=[],
+                        help="run scenarios whose name starts with this (repeatable)")
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="keep the response and invoice caches between requests")
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--compare", help="previous report to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="with --compare, fail when a p50 grew by more than this percent")
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("DATABASE_URL"):
+        parser.error("set DATABASE_URL to the benchmark database")
+
+    invoice_dir = tempfile.mkdtemp(prefix="bench-invoices-")
+    os.environ["INVOICE_CACHE_DIR"] = invoice_dir
+    os.environ.setdefault("SLOW_REQUEST_MS", "0")
+
+    from app import create_app
+
+    app = create_app()
+    app.config["INVOICE_CACHE_DIR"] = invoice_dir
+    client = app.test_client()
+    counter = QueryCounter()
+    fixtures = load_fixtures(app)
+
+    scenarios, created = build_scenarios(fixtures)
+    if args.only:
+        scenarios = [s for s in scenarios if s.name.startswith(tuple(args.only))]
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(
+                app, client, scenario, created, args, counter, invoice_dir
+            )
+            print(f"  {scenario.name}: p50 {results[scenario.name]['p50Ms']}ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(invoice_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": fixtures["database"],
+        "orders": fixtures["orders"],
+        "warmCaches": args.warm_caches,
+        "scenarios": results,
+    }
+
+    regressed = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report["baselineCommit"] = baseline.get("commit")
+        report["changePercent"], regressed = compare(report, baseline, args.max_regression)
+        report["regressed"] = regressed
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if regressed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
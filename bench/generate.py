@@ -0,0 +1,249 @@
+"""
+Fill a local database with seeded synthetic data: clients, products,
+classes, genres and orders.
+
+Client activity is Zipf-skewed (a few clients place most orders), order
+volume grows over the period and follows EAT working days and hours.
+Orders are loaded with multi-row INSERTs, then the daily_revenue rollup
+and row counts are rebuilt and the table versions bumped.
+
+    DATABASE_URL=postgresql://postgres@localhost/orders_bench \\
+        python -m bench.generate --orders 100000 --reset
+
+The same seed, sizes and --end-date always produce the same rows, ids
+included. DATABASE_URL must be set explicitly so the production default
+is never written to.
+"""
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+EAT = timezone(timedelta(hours=3))
+
+FIRST_NAMES = [
+    "Amina", "Brian", "Cynthia", "David", "Esther", "Felix", "Grace", "Hassan",
+    "Irene", "James", "Kevin", "Lucy", "Mercy", "Nelson", "Olive", "Peter",
+    "Ruth", "Samuel", "Tabitha", "Victor", "Wanjiru", "Yusuf", "Zawadi",
+]
+LAST_NAMES = [
+    "Achieng", "Barasa", "Chege", "Kamau", "Kiprono", "Mutua", "Njoroge",
+    "Odhiambo", "Otieno", "Wafula", "Wambui", "Kariuki", "Mwangi", "Omondi",
+]
+INSTITUTIONS = [
+    "University of Nairobi", "Kenyatta University", "Strathmore University",
+    "Moi University", "JKUAT", "Egerton University", "Maseno University",
+    "USIU-Africa", "Daystar University", "Technical University of Kenya",
+]
+PRODUCT_KINDS = [
+    ("Essay", 350), ("Research Paper", 450), ("PowerPoint Slides", 250),
+    ("Dissertation Chapter", 600), ("Lab Report", 400), ("Case Study", 420),
+    ("Editing", 150), ("Proofreading", 100), ("Annotated Bibliography", 300),
+    ("Literature Review", 500), ("Thesis Proposal", 650), ("Data Analysis", 800),
+]
+CLASS_NAMES = ["High School", "Diploma", "Undergraduate", "Masters", "PhD", "Professional"]
+GENRE_NAMES = [
+    "Business", "Nursing", "Law", "Economics", "Computer Science", "Education",
+    "Engineering", "Psychology", "Sociology", "Literature", "History", "Finance",
+]
+
+# Relative order volume by EAT weekday (Mon..Sun) and hour
+WEEKDAY_WEIGHTS = [1.0, 1.1, 1.1, 1.05, 0.95, 0.5, 0.35]
+HOUR_WEIGHTS = [
+    0.05, 0.02, 0.02, 0.02, 0.03, 0.1, 0.3, 0.6, 0.9, 1.0, 1.0, 1.0,
+    0.9, 0.95, 1.0, 1.0, 0.95, 0.85, 0.7, 0.6, 0.5, 0.35, 0.2, 0.1,
+]
+
+
+def cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def seeded_uuid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+
+def pick(rnd, items, cum):
+    return items[bisect.bisect_right(cum, rnd.random() * cum[-1])]
+
+
+def make_dimensions(rnd, n_clients, n_products, n_classes, n_genres, now):
+    clients = []
+    for i in range(n_clients):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        clients.append({
+            "id": seeded_uuid(rnd),
+            "clientName": f"{first} {last} {i}",
+            "institution": rnd.choice(INSTITUTIONS),
+            "phone": f"+2547{rnd.randrange(10 ** 8):08d}",
+            "email": f"{first}.{last}{i}@example.com".lower(),
+            "createdAt": now,
+            "updatedAt": now,
+        })
+
+    products = []
+    for i in range(n_products):
+        kind, base = PRODUCT_KINDS[i % len(PRODUCT_KINDS)]
+        tier = i // len(PRODUCT_KINDS)
+        products.append({
+            "id": seeded_uuid(rnd),
+            "name": f"{kind}" + (f" (tier {tier + 1})" if tier else ""),
+            "pricePerUnit": float(round(base * (1 + 0.25 * tier) * rnd.uniform(0.9, 1.1))),
+            "createdAt": now,
+            "updatedAt": now,
+        })
+
+    def named(names, count):
+        rows = []
+        for i in range(count):
+            name = names[i % len(names)]
+            if i >= len(names):
+                name = f"{name} {i // len(names) + 1}"
+            rows.append({"id": seeded_uuid(rnd), "name": name, "createdAt": now, "updatedAt": now})
+        return rows
+
+    return clients, products, named(CLASS_NAMES, n_classes), named(GENRE_NAMES, n_genres)
+
+
+def order_rows(rnd, n_orders, clients, products, classes, genres, start, days, skew):
+    """Yield order dicts ready for an INSERT into orders."""
+    client_cum = cumulative(1 / (rank + 1) ** skew for rank in range(len(clients)))
+    # Popular products first, gentler skew than clients
+    product_cum = cumulative(1 / (rank + 1) ** 0.8 for rank in range(len(products)))
+    # Volume grows ~3x from the first to the last day of the period
+    day_weights = [
+        (1 + 2 * d / max(days - 1, 1)) * WEEKDAY_WEIGHTS[(start + timedelta(days=d)).weekday()]
+        for d in range(days)
+    ]
+    day_cum = cumulative(day_weights)
+    hour_cum = cumulative(HOUR_WEIGHTS)
+    day_index = list(range(days))
+    hours = list(range(24))
+
+    for _ in range(n_orders):
+        product = pick(rnd, products, product_cum)
+        pages = max(1, int(rnd.lognormvariate(1.6, 0.7)))
+        created = start + timedelta(
+            days=pick(rnd, day_index, day_cum),
+            hours=pick(rnd, hours, hour_cum),
+            seconds=rnd.randrange(3600),
+        )
+        created_utc = created.astimezone(timezone.utc)
+        yield {
+            "id": seeded_uuid(rnd),
+            "clientId": pick(rnd, clients, client_cum)["id"],
+            "productId": product["id"],
+            "classId": rnd.choice(classes)["id"] if rnd.random() < 0.85 else None,
+            "genreId": rnd.choice(genres)["id"] if rnd.random() < 0.9 else None,
+            "week": str(rnd.randint(1, 14)) if rnd.random() < 0.7 else None,
+            "pagesOrSlides": pages,
+            "totalCost": product["pricePerUnit"] * pages,
+            "description": f"Order for {product['name'].lower()}" if rnd.random() < 0.3 else None,
+            "createdAt": created_utc,
+            "updatedAt": created_utc,
+        }
+
+
+def generate(args):
+    from app import create_app
+    from app.counts import rebuild_row_counts
+    from app.dimensions import DIMENSION_TABLES, bump_version
+    from app.models import db, Class, Client, Genre, Order, Product
+    from app.rollup import rebuild_rollup
+
+    rnd = random.Random(args.seed)
+    n_clients = args.clients or max(10, args.orders // 200)
+    if args.end_date:
+        end_eat = datetime.fromisoformat(args.end_date).replace(tzinfo=EAT)
+    else:
+        end_eat = datetime.now(EAT)
+    end_eat = end_eat.replace(hour=0, minute=0, second=0, microsecond=0)
+    now = end_eat.astimezone(timezone.utc)
+    start_eat = end_eat - timedelta(days=args.days)
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+
+        clients, products, classes, genres = make_dimensions(
+            rnd, n_clients, args.products, args.classes, args.genres, now
+        )
+        # Shuffle so the busiest clients are not the first ones created
+        activity = clients[:]
+        rnd.shuffle(activity)
+
+        # Core inserts: the rows are plain dicts, no ORM bookkeeping needed
+        for model, rows in ((Client, clients), (Product, products), (Class, classes), (Genre, genres)):
+            db.session.execute(model.__table__.insert(), rows)
+        db.session.commit()
+
+        rows = order_rows(
+            rnd, args.orders, activity, products, classes, genres,
+            start_eat, args.days, args.skew,
+        )
+        loaded = 0
+        while True:
+            batch = list(itertools.islice(rows, args.batch_size))
+            if not batch:
+                break
+            db.session.execute(Order.__table__.insert(), batch)
+            db.session.commit()
+            loaded += len(batch)
+            if not args.quiet:
+                rate = loaded / (time.perf_counter() - started)
+                print(f"  {loaded}/{args.orders} orders ({rate:,.0f}/s)", file=sys.stderr)
+
+        rebuild_rollup()
+        rebuild_row_counts()
+        bump_version(*DIMENSION_TABLES, "clients", "orders")
+        db.session.commit()
+
+    return {
+        "seed": args.seed,
+        "clients": n_clients,
+        "products": args.products,
+        "classes": args.classes,
+        "genres": args.genres,
+        "orders": args.orders,
+        "startDate": start_eat.isoformat(),
+        "endDate": end_eat.isoformat(),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, help="default: orders / 200")
+    parser.add_argument("--products", type=int, default=24)
+    parser.add_argument("--classes", type=int, default=6)
+    parser.add_argument("--genres", type=int, default=12)
+    parser.add_argument("--days", type=int, default=730, help="length of the order history")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of client activity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", help="last day of the history (EAT, ISO date); default today")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("DATABASE_URL"):
+        parser.error("set DATABASE_URL to the database to fill")
+    if args.orders < 0 or args.days < 1 or args.products < 1 or args.classes < 1 or args.genres < 1:
+        parser.error("sizes must be positive")
+
+    report = generate(args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
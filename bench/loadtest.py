@@ -0,0 +1,434 @@
+"""
+Open-loop load test against the gunicorn entry point (run:app).
+
+Starts gunicorn locally for each --workers/--threads combination, ramps
+through the --rates (requests/second) with a weighted mix of dashboard
+polls, order list pages, order creation and invoice downloads, and
+reports throughput, latency percentiles, error rates and the highest
+rate each configuration sustains. Requests are issued on schedule no
+matter how slow the server is, and latency is measured from the
+scheduled start, so queueing shows up in the numbers instead of being
+hidden by a slower client.
+
+    DATABASE_URL=... python -m bench.loadtest --workers 1,2,4 --threads 1,4 \\
+        --rates 10,25,50,100 --duration 20 --mix dashboard=3,orders=5,create=1,invoice=1
+
+Use --url to load an already running server instead (no sweep). Order
+creation writes to the target database; leave it out of --mix for a
+read-only run. Prints a JSON report with a suggested Procfile line.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+DEFAULT_MIX = "dashboard=3,orders=5,create=1,invoice=1"
+
+
+# ---- HTTP/1.1 client ----
+
+class HTTPError(Exception):
+    pass
+
+
+class Connection:
+    """One keep-alive connection; reopened when the server closes it."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            await self.open()
+
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            "Accept-Encoding: identity",
+        ]
+        if body is not None:
+            head += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HTTPError("connection closed")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        chunks = []
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                chunks.append((await self.reader.readexactly(size + 2))[:-2])
+                if size == 0:
+                    break
+        elif "content-length" in headers:
+            chunks.append(await self.reader.readexactly(int(headers["content-length"])))
+        else:
+            chunks.append(await self.reader.read())
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, b"".join(chunks)
+
+
+class Pool:
+    def __init__(self, host, port, size):
+        self.idle = asyncio.LifoQueue()
+        for _ in range(size):
+            self.idle.put_nowait(Connection(host, port))
+
+    async def request(self, method, path, body=None):
+        conn = await self.idle.get()
+        try:
+            return await conn.request(method, path, body)
+        except BaseException:
+            conn.close()
+            raise
+        finally:
+            self.idle.put_nowait(conn)
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+# ---- Workload ----
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in REQUESTS:
+            raise ValueError(f"unknown request kind {name.strip()!r}; choose from {', '.join(REQUESTS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def dashboard_request(rnd, fixtures):
+    period = rnd.choice(["month", "week"])
+    return "GET", f"/api/v1/analytics/dashboard?period={period}&trendPeriod=1month", None
+
+
+def orders_request(rnd, fixtures):
+    page = min(int(rnd.paretovariate(1.5)), 50)
+    return "GET", f"/api/v1/orders?page={page}&pageSize=20", None
+
+
+def create_request(rnd, fixtures):
+    return "POST", "/api/v1/orders", {
+        "clientId": rnd.choice(fixtures["clients"]),
+        "productId": rnd.choice(fixtures["products"]),
+        "pagesOrSlides": rnd.randint(1, 12),
+    }
+
+
+def invoice_request(rnd, fixtures):
+    end = date.today()
+    start = end - timedelta(days=30)
+    client = rnd.choice(fixtures["clients"][:20])
+    fmt = rnd.choice(["pdf", "excel"])
+    return "GET", (
+        f"/api/v1/invoices/download/{fmt}?clientId={client}"
+        f"&startDate={start}&endDate={end}"
+    ), None
+
+
+REQUESTS = {
+    "dashboard": dashboard_request,
+    "orders": orders_request,
+    "create": create_request,
+    "invoice": invoice_request,
+}
+
+
+class Target:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+
+async def load_fixtures(target):
+    """Client and product ids to build requests from, read over HTTP."""
+    fixtures = {}
+    conn = Connection(target.host, target.port)
+    try:
+        for key, path in (("clients", "/api/v1/clients?pageSize=100"),
+                          ("products", "/api/v1/products?pageSize=100")):
+            status, body = await conn.request("GET", path)
+            if status != 200:
+                raise SystemExit(f"GET {path} returned {status}")
+            fixtures[key] = [item["id"] for item in json.loads(body)["data"]]
+            if not fixtures[key]:
+                raise SystemExit(f"No {key} in the database; run python -m bench.generate first")
+    finally:
+        conn.close()
+    return fixtures
+
+
+async def run_step(target, rate, duration, mix, fixtures, connections, timeout, seed):
+    """Issue ``rate`` requests/second for ``duration`` seconds."""
+    rnd = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    pool = Pool(target.host, target.port, connections)
+    loop = asyncio.get_running_loop()
+    results = []
+
+    async def one(kind, scheduled):
+        method, path, body = REQUESTS[kind](rnd, fixtures)
+        try:
+            status, _ = await asyncio.wait_for(pool.request(method, path, body), timeout)
+            error = None if status < 400 else f"HTTP {status}"
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except (OSError, HTTPError, asyncio.IncompleteReadError, ValueError) as e:
+            error = type(e).__name__
+        results.append((kind, loop.time() - scheduled, error, loop.time()))
+
+    tasks = []
+    start = loop.time()
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(rnd.choices(kinds, weights)[0], scheduled)))
+    await asyncio.gather(*tasks)
+    pool.close()
+
+    return summarize(rate, results, start)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def latency_stats(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50Ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95Ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99Ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "maxMs": round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+
+
+def summarize(rate, results, start):
+    finished = max((r[3] for r in results), default=start)
+    ok = [r for r in results if r[2] is None]
+    errors = {}
+    for _, _, error, _ in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+
+    by_kind = {}
+    for kind in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == kind]
+        by_kind[kind] = dict(
+            latency_stats([r[1] for r in rows if r[2] is None]),
+            errors=sum(1 for r in rows if r[2]),
+        )
+
+    return {
+        "targetRate": rate,
+        "requests": len(results),
+        "throughput": round(len(ok) / max(finished - start, 1e-9), 1),
+        "errorRate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "latency": latency_stats([r[1] for r in ok]),
+        "byKind": by_kind,
+    }
+
+
+def sustained(step, slo_ms, max_error_rate):
+    """Did the server keep up with the step's target rate?"""
+    latency = step["latency"]
+    return (
+        step["throughput"] >= 0.9 * step["targetRate"]
+        and step["errorRate"] <= max_error_rate
+        and latency["p95Ms"] is not None
+        and latency["p95Ms"] <= slo_ms
+    )
+
+
+# ---- Server management ----
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(root, workers, threads, port, log):
+    env = dict(os.environ)
+    # Each thread can hold a connection; don't let the pool be the limit
+    env.setdefault("DB_POOL_SIZE", str(max(threads, 1)))
+    command = [
+        sys.executable, "-m", "gunicorn", "run:app",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--threads", str(threads),
+        "--worker-class", "gthread" if threads > 1 else "sync",
+    ]
+    return subprocess.Popen(command, cwd=root, env=env, stdout=log, stderr=log)
+
+
+def wait_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(b"GET /api/v1/meta/classes HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+                if s.recv(12).startswith(b"HTTP/1.1 200"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit("gunicorn did not become ready")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def ramp(target, args, mix):
+    fixtures = await load_fixtures(target)
+
+    steps = []
+    for i, rate in enumerate(args.rates):
+        step = await run_step(
+            target, rate, args.duration, mix, fixtures,
+            args.connections, args.timeout, args.seed + i,
+        )
+        step["sustained"] = sustained(step, args.slo_ms, args.max_error_rate)
+        steps.append(step)
+        print(
+            f"    {rate}/s: {step['throughput']}/s ok, p95 {step['latency']['p95Ms']}ms, "
+            f"errors {step['errorRate']:.1%}{'' if step['sustained'] else '  (saturated)'}",
+            file=sys.stderr,
+        )
+        if not step["sustained"] and not args.full_ramp:
+            break
+
+    best = max((s["targetRate"] for s in steps if s["sustained"]), default=0)
+    return {"maxSustainedRate": best, "steps": steps}
+
+
+def csv_ints(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def csv_floats(text):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="load this running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=csv_ints, default=[1, 2, 4])
+    parser.add_argument("--threads", type=csv_ints, default=[1, 4])
+    parser.add_argument("--rates", type=csv_floats, default=[5, 10, 20, 40, 80],
+                        help="requests/second per ramp step")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted request kinds")
+    parser.add_argument("--connections", type=int, default=64, help="client connection limit")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout (s)")
+    parser.add_argument("--slo-ms", type=float, default=500, help="p95 a sustained step must meet")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--full-ramp", action="store_true", help="keep ramping past saturation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = {"mix": mix, "durationPerStep": args.duration, "sloMs": args.slo_ms, "runs": []}
+
+    if args.url:
+        parts = urlsplit(args.url)
+        target = Target(parts.hostname, parts.port or 80)
+        report["runs"].append(dict(url=args.url, **asyncio.run(ramp(target, args, mix))))
+    else:
+        if not os.environ.get("DATABASE_URL"):
+            parser.error("set DATABASE_URL (or pass --url)")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for workers in args.workers:
+            for threads in args.threads:
+                port = free_port()
+                print(f"  gunicorn --workers {workers} --threads {threads}", file=sys.stderr)
+                with open(os.devnull, "w") as log:
+                    process = start_server(root, workers, threads, port, log)
+                    try:
+                        wait_ready(port, process)
+                        run = asyncio.run(ramp(Target("127.0.0.1", port), args, mix))
+                    finally:
+                        stop_server(process)
+                report["runs"].append(dict(workers=workers, threads=threads, **run))
+
+        # Highest sustained rate wins; fewer processes break ties (less memory)
+        best = max(
+            report["runs"],
+            key=lambda r: (r["maxSustainedRate"], -r["workers"], -r["threads"]),
+        )
+        report["best"] = {
+            "workers": best["workers"],
+            "threads": best["threads"],
+            "maxSustainedRate": best["maxSustainedRate"],
+            "procfile": f"web: gunicorn run:app --workers {best['workers']} --threads {best['threads']}",
+            "env": {"WEB_CONCURRENCY": best["workers"], "GUNICORN_THREADS": best["threads"]},
+        }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Measure list-page serialization throughput in rows per second: the old
+path (ORM instances, per-row dict building and timestamp conversion,
+stdlib json) against the current one (Row tuples converted a column at
+a time, encoded by the app's JSON provider).
+
+The old orders path is the original ``order_to_dict``, copied below,
+which reads every nested object through the ORM relationships; today's
+``order_to_dict`` goes through the dimension cache and would flatter it.
+
+    DATABASE_URL=... python -m bench.serialization --page-size 500
+
+Each page is fetched once; only the conversion from rows to response
+bytes is timed, so the numbers isolate serialization from the database.
+"""
+import argparse
+import json
+import os
+import time
+
+from sqlalchemy.orm import joinedload
+
+
+def throughput(fn, rows, seconds):
+    """Rows per second of ``fn(rows)``, repeated for about ``seconds``."""
+    fn(rows)
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        fn(rows)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return round(runs * len(rows) / elapsed)
+
+
+def original_order_to_dict(order):
+    """``order_to_dict`` as it was before list pages moved to Row tuples."""
+    from app.routes.orders import to_eat
+
+    return {
+        "id": order.id,
+        "totalCost": order.totalCost,
+        "pagesOrSlides": order.pagesOrSlides,
+        "description": order.description,
+        "week": order.week,
+        "createdAt": to_eat(order.createdAt),
+        "client": {
+            "id": order.client.id,
+            "clientName": order.client.clientName
+        } if order.client else None,
+        "product": {
+            "id": order.product.id,
+            "name": order.product.name,
+            "pricePerUnit": order.product.pricePerUnit,
+        } if order.product else None,
+        "class": {
+            "id": order.order_class.id,
+            "name": order.order_class.name,
+        } if order.order_class else None,
+        "genre": {
+            "id": order.order_genre.id,
+            "name": order.order_genre.name,
+        } if order.order_genre else None,
+    }
+
+
+def stdlib_dumps(obj):
+    # What jsonify did before: sorted keys, compact, ASCII
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+
+
+def run(app, page_size, seconds):
+    from app.models import db, Client, Order, Product
+    from app.routes.clients import CLIENT_COLUMNS, CLIENT_CONVERTERS, client_to_dict
+    from app.routes.orders import ORDER_RELATIONS, order_row_query, order_rows_to_dicts
+    from app.routes.products import PRODUCT_COLUMNS, PRODUCT_CONVERTERS, serialize_product
+    from app.serializers import rows_to_dicts
+
+    expand = list(ORDER_RELATIONS)
+    encode = app.json.dumps_bytes if hasattr(app.json, "dumps_bytes") else stdlib_dumps
+
+    with app.test_request_context():
+        # Relationships are loaded up front (the untimed warm-up call would
+        # lazy-load them anyway), so only attribute access is measured
+        order_objects = (
+            Order.query.options(
+                joinedload(Order.client), joinedload(Order.product),
+                joinedload(Order.order_class), joinedload(Order.order_genre),
+            )
+            .order_by(Order.createdAt.desc()).limit(page_size).all()
+        )
+        order_rows = (
+            order_row_query(expand, Order.__table__.c.createdAt)
+            .order_by(Order.createdAt.desc()).limit(page_size).all()
+        )
+        client_objects = Client.query.limit(page_size).all()
+        client_rows = db.session.query(*CLIENT_COLUMNS).limit(page_size).all()
+        product_objects = Product.query.limit(page_size).all()
+        product_rows = db.session.query(*PRODUCT_COLUMNS).limit(page_size).all()
+
+        cases = {
+            "orders": (
+                order_objects, lambda rows: stdlib_dumps([original_order_to_dict(o) for o in rows]),
+                order_rows, lambda rows: encode(order_rows_to_dicts(rows, None, expand)),
+            ),
+            "clients": (
+                client_objects, lambda rows: stdlib_dumps([client_to_dict(c) for c in rows]),
+                client_rows, lambda rows: encode(rows_to_dicts(rows, CLIENT_CONVERTERS)),
+            ),
+            "products": (
+                product_objects, lambda rows: stdlib_dumps([serialize_product(p) for p in rows]),
+                product_rows, lambda rows: encode(rows_to_dicts(rows, PRODUCT_CONVERTERS)),
+            ),
+        }
+
+        report = {}
+        for name, (objects, before, rows, after) in cases.items():
+            if not rows:
+                continue
+            before_rate = throughput(before, objects, seconds)
+            after_rate = throughput(after, rows, seconds)
+            report[name] = {
+                "rows": len(rows),
+                "beforeRowsPerSec": before_rate,
+                "afterRowsPerSec": after_rate,
+                "speedup": round(after_rate / before_rate, 2),
+            }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent per measurement")
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("DATABASE_URL"):
+        parser.error("set DATABASE_URL to the benchmark database")
+
+    from app import create_app
+    from app.serializers import orjson
+
+    app = create_app()
+    report = {
+        "encoder": type(app.json).__name__,
+        "orjson": getattr(orjson, "__version__", None),
+        "pageSize": args.page_size,
+        "before": "ORM instances, original per-relation serializers, stdlib json",
+        "after": "Row tuples, column converters, app JSON provider",
+        "results": run(app, args.page_size, args.seconds),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
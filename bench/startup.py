@@ -0,0 +1,101 @@
+"""
+Measure worker boot cost: the time to import the app and run
+``create_app()``, and the resident memory afterwards.
+
+Every gunicorn worker pays this once, so a regression here slows deploys
+and scale-ups. Each sample runs in a fresh interpreter.
+
+    python -m bench.startup --runs 5 --max-ms 1500 --max-rss-mb 120
+
+Prints a JSON report; exits non-zero when a limit is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Libraries that should only load when an export is actually rendered
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "reportlab"]
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+
+rss_kb = None
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+heavy = [m for m in %(heavy)r if m in sys.modules]
+print(json.dumps({
+    "importMs": (t1 - t0) * 1000,
+    "createAppMs": (t2 - t1) * 1000,
+    "rssKb": rss_kb,
+    "heavyModules": heavy,
+}))
+"""
+
+
+def sample(root):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD % {"heavy": HEAVY_MODULES}],
+        cwd=root,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail if median boot time exceeds this")
+    parser.add_argument("--max-rss-mb", type=float, help="fail if median RSS exceeds this")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = [sample(root) for _ in range(args.runs)]
+
+    boot = [s["importMs"] + s["createAppMs"] for s in samples]
+    rss = [s["rssKb"] / 1024 for s in samples]
+    report = {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "bootMs": {
+            "median": round(statistics.median(boot), 1),
+            "min": round(min(boot), 1),
+            "max": round(max(boot), 1),
+        },
+        "importMsMedian": round(statistics.median(s["importMs"] for s in samples), 1),
+        "createAppMsMedian": round(statistics.median(s["createAppMs"] for s in samples), 1),
+        "rssMbMedian": round(statistics.median(rss), 1),
+        "heavyModulesLoaded": sorted({m for s in samples for m in s["heavyModules"]}),
+    }
+
+    failures = []
+    if args.max_ms is not None and report["bootMs"]["median"] > args.max_ms:
+        failures.append(f"boot time {report['bootMs']['median']}ms > {args.max_ms}ms")
+    if args.max_rss_mb is not None and report["rssMbMedian"] > args.max_rss_mb:
+        failures.append(f"RSS {report['rssMbMedian']}MB > {args.max_rss_mb}MB")
+    if report["heavyModulesLoaded"]:
+        failures.append("export libraries imported at startup: " + ", ".join(report["heavyModulesLoaded"]))
+    report["failures"] = failures
+
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
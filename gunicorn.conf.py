@@ -0,0 +1,16 @@
+# Read by gunicorn from the working directory; command-line flags win.
+# Size workers/threads with ``python -m bench.loadtest``.
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = "gthread" if threads > 1 else "sync"
+
+
+def on_starting(server):
+    # Snapshots left by the previous master's workers would be counted again
+    directory = os.environ.get("METRICS_DIR")
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith("metrics-"):
+                os.remove(os.path.join(directory, name))
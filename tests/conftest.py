@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+# Database tests run against a scratch Postgres or CockroachDB database,
+# which they empty: TEST_DATABASE_URL=postgresql://.../scratch pytest
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest.fixture
+def app():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from app import create_app
+    from app.models import db
+
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def catalog(app):
+    """A client and a product to place orders with."""
+    from app.models import db, Client, Product
+
+    client = Client(clientName="Client", institution="Uni")
+    product = Product(name="Slides", pricePerUnit=10.0)
+    db.session.add_all([client, product])
+    db.session.commit()
+    return client.id, product.id
@@ -0,0 +1,109 @@
+import pytest
+
+from app import services
+from app.counts import rebuild_row_counts, row_count
+from app.models import db, Order
+
+
+def order_rows(catalog, count):
+    client_id, product_id = catalog
+    return [
+        {"clientId": client_id, "productId": product_id, "pagesOrSlides": i + 1}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def counted(app):
+    rebuild_row_counts()
+    db.session.commit()
+
+
+def test_empty_bulk_insert_is_created(app, counted):
+    response = app.test_client().post("/api/v1/orders/bulk", json=[])
+    assert response.status_code == 201
+    assert response.get_json() == {"inserted": 0, "failed": 0, "errors": [], "ids": []}
+
+
+def test_all_rows_invalid_is_bad_request(app, counted):
+    response = app.test_client().post("/api/v1/orders/bulk", json=[{"pagesOrSlides": 1}])
+    assert response.status_code == 400
+    assert response.get_json()["failed"] == 1
+
+
+def test_failed_batch_reports_committed_orders(app, catalog, counted, monkeypatch):
+    app.config["BULK_BATCH_SIZE"] = 2
+    apply_orders_delta = services.apply_orders_delta
+    calls = []
+
+    def fail_third_batch(condition):
+        calls.append(condition)
+        if len(calls) == 3:
+            raise RuntimeError("connection lost")
+        apply_orders_delta(condition)
+
+    monkeypatch.setattr(services, "apply_orders_delta", fail_third_batch)
+
+    response = app.test_client().post("/api/v1/orders/bulk", json=order_rows(catalog, 6))
+    assert response.status_code == 500
+    body = response.get_json()
+    assert body["inserted"] == 4
+    saved = db.session.execute(db.select(Order.id)).scalars().all()
+    assert sorted(body["ids"]) == sorted(saved)
+    assert row_count("orders") == 4
+
+
+def test_failed_atomic_insert_saves_nothing(app, catalog, counted, monkeypatch):
+    app.config["BULK_BATCH_SIZE"] = 2
+
+    def fail(condition):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(services, "apply_orders_delta", fail)
+
+    response = app.test_client().post(
+        "/api/v1/orders/bulk?atomic=true", json=order_rows(catalog, 4)
+    )
+    assert response.status_code == 500
+    assert response.get_json()["inserted"] == 0
+    assert response.get_json()["ids"] == []
+    assert row_count("orders") == 0
+
+
+@pytest.mark.parametrize("method", ["patch", "delete"])
+@pytest.mark.parametrize("body", [
+    {"ids": [["a"], "b"]},
+    {"ids": [{"id": "a"}]},
+    {"ids": [1, 2]},
+    {"ids": "a"},
+    {"filter": {"startDate": "last tuesday"}},
+    {"filter": {"endDate": 20260101}},
+    {"filter": {"clientId": ["a", "b"]}},
+])
+def test_malformed_bulk_target_is_bad_request(app, counted, method, body):
+    body = dict(body, set={"week": "3"})
+    response = getattr(app.test_client(), method)("/api/v1/orders", json=body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("pages", [2.5, float("nan"), float("inf"), True, -1, "abc", None])
+def test_invalid_pages_are_rejected(app, catalog, pages):
+    client_id, product_id = catalog
+    rows = [{"clientId": client_id, "productId": product_id, "pagesOrSlides": pages}]
+
+    orders, errors = services.validate_bulk_rows(rows)
+
+    assert orders == []
+    assert errors[0]["errors"] == {"pagesOrSlides": "Must be a non-negative integer"}
+
+
+@pytest.mark.parametrize("pages, expected", [(3, 3), (3.0, 3), ("3", 3), (0, 0)])
+def test_integral_pages_are_accepted(app, catalog, pages, expected):
+    client_id, product_id = catalog
+    rows = [{"clientId": client_id, "productId": product_id, "pagesOrSlides": pages}]
+
+    orders, errors = services.validate_bulk_rows(rows)
+
+    assert errors == []
+    assert orders[0]["pagesOrSlides"] == expected
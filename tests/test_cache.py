@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask, g, jsonify
+
+from app.cache import MemoryBackend, ResponseCache, cached_response, invalidate_orders
+
+
+@pytest.fixture
+def cache_app():
+    app = Flask(__name__)
+    app.config.update(
+        ANALYTICS_CACHE_TTL=60,
+        ANALYTICS_CACHE_MAX_ENTRIES=16,
+        ANALYTICS_CACHE_BACKEND="app.cache:MemoryBackend",
+        ANALYTICS_FOLLOWER_READS=True,
+        FOLLOWER_READ_STALENESS=10,
+    )
+    seen = []
+
+    @app.get("/report")
+    @cached_response(lambda args: {})
+    def report():
+        seen.append(g.fresh_reads)
+        # What follower_reads() records when it applies
+        g.follower_read = not g.fresh_reads
+        return jsonify({"calls": len(seen)})
+
+    app.seen = seen
+    return app
+
+
+def test_invalidation_marker_survives_range_invalidation():
+    cache = ResponseCache(MemoryBackend(), ttl=60, fresh_window=10)
+    assert not cache.recently_invalidated()
+
+    cache.set("key", b"{}", [(datetime(2026, 1, 1, tzinfo=timezone.utc),
+                              datetime(2026, 2, 1, tzinfo=timezone.utc))])
+    cache.invalidate(datetime(2026, 1, 5, tzinfo=timezone.utc))
+    assert cache.backend.get("key") is None
+    assert cache.recently_invalidated()
+
+    cache.invalidate(datetime(2026, 3, 5, tzinfo=timezone.utc))
+    assert cache.recently_invalidated()
+
+
+def test_marker_takes_no_entry_and_is_not_evicted():
+    cache = ResponseCache(MemoryBackend(max_entries=2), ttl=60, fresh_window=10)
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+    for i in range(5):
+        cache.set(f"key{i}", b"{}", [])
+    assert cache.stats()["entries"] == 2
+    assert cache.recently_invalidated()
+
+
+class PlainBackend:
+    """A configured backend with only the get/set/delete/items/clear methods."""
+
+    def __init__(self):
+        store = MemoryBackend()
+        self.get, self.set, self.delete = store.get, store.set, store.delete
+        self.items, self.clear = store.items, store.clear
+
+
+def test_marker_falls_back_to_an_entry():
+    cache = ResponseCache(PlainBackend(), ttl=60, fresh_window=10)
+    cache.invalidate()
+    assert cache.recently_invalidated()
+
+    cache.invalidate(datetime(2026, 1, 5, tzinfo=timezone.utc))
+    assert cache.recently_invalidated()
+
+
+def test_no_marker_without_follower_reads():
+    cache = ResponseCache(MemoryBackend(), ttl=60)
+    cache.invalidate()
+    assert not cache.recently_invalidated()
+
+
+def test_miss_after_invalidation_reads_fresh_data(cache_app):
+    client = cache_app.test_client()
+
+    assert client.get("/report").headers["X-Cache"] == "MISS"
+    assert client.get("/report").headers["X-Cache"] == "HIT"
+    assert cache_app.seen == [False]
+
+    with cache_app.app_context():
+        invalidate_orders()
+
+    response = client.get("/report")
+    assert response.headers["X-Cache"] == "MISS"
+    assert cache_app.seen == [False, True]
+    # Computed from current data, so it is cached as usual
+    assert client.get("/report").headers["X-Cache"] == "HIT"
+
+
+def test_follower_read_overlapping_invalidation_is_not_cached(cache_app):
+    @cache_app.get("/slow-report")
+    @cached_response(lambda args: {})
+    def slow_report():
+        g.follower_read = True
+        # A write commits while the follower read is running
+        invalidate_orders()
+        return jsonify({})
+
+    client = cache_app.test_client()
+    assert client.get("/slow-report").headers["X-Cache"] == "MISS"
+    assert client.get("/slow-report").headers["X-Cache"] == "MISS"
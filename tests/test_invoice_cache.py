@@ -0,0 +1,33 @@
+import os
+
+from app.invoice_cache import InvoiceCache
+
+
+def test_store_returns_readable_file_larger_than_cache(tmp_path):
+    cache = InvoiceCache(str(tmp_path), max_bytes=10)
+    data = b"x" * 100
+
+    with cache.store("big", "xlsx", lambda out: out.write(data)) as f:
+        # Eviction already removed the entry; the handle still reads it
+        assert not os.path.exists(cache.path("big", "xlsx"))
+        assert f.read() == data
+
+
+def test_store_then_open_hits(tmp_path):
+    cache = InvoiceCache(str(tmp_path), max_bytes=1000)
+
+    with cache.store("small", "pdf", lambda out: out.write(b"%PDF")) as f:
+        assert f.read() == b"%PDF"
+    with cache.open("small", "pdf") as f:
+        assert f.read() == b"%PDF"
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_evict_drops_least_recently_used(tmp_path):
+    cache = InvoiceCache(str(tmp_path), max_bytes=250)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.store(key, "pdf", lambda out: out.write(b"x" * 100)).close()
+        os.utime(cache.path(key, "pdf"), (1000 + i, 1000 + i))
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == ["b.pdf", "c.pdf"]
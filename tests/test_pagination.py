@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models import Order
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+COLUMNS = {
+    "-createdAt": Order.createdAt,
+    "totalCost": Order.totalCost,
+    "-totalCost": Order.totalCost,
+    "pagesOrSlides": Order.pagesOrSlides,
+    "week": Order.week,
+}
+
+
+def raw_cursor(payload):
+    data = json.dumps(payload).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    created = datetime(2026, 1, 2, 21, 30, 5)
+    cursor = encode_cursor("-createdAt", created, "abc")
+    assert decode_cursor(cursor, "-createdAt", Order.createdAt) == (created, "abc")
+
+
+@pytest.mark.parametrize("sort, value", [
+    ("totalCost", 12.5),
+    ("totalCost", 12),
+    ("pagesOrSlides", 3),
+    ("week", "2"),
+    ("week", None),
+])
+def test_cursor_values_matching_the_column(sort, value):
+    cursor = encode_cursor(sort, value, "abc")
+    assert decode_cursor(cursor, sort, COLUMNS[sort]) == (value, "abc")
+
+
+@pytest.mark.parametrize("payload", [
+    ["-createdAt", {"dt": "not a date"}, "abc"],
+    ["-createdAt", {"dt": 5}, "abc"],
+    ["-createdAt", {"other": 1}, "abc"],
+    ["-createdAt", [1, 2], "abc"],
+    ["-createdAt", "2026-01-02", ["abc"]],
+    ["-createdAt", "2026-01-02", {"id": "abc"}],
+    ["-createdAt", "2026-01-02"],
+    ["-createdAt", "abc", "abc"],
+    ["-createdAt", 1767225600, "abc"],
+    ["totalCost", "x", "abc"],
+    ["totalCost", True, "abc"],
+    ["totalCost", {"dt": "2026-01-02T00:00:00"}, "abc"],
+    ["pagesOrSlides", "3", "abc"],
+    ["week", 2, "abc"],
+    {"sort": "-createdAt"},
+])
+def test_tampered_cursor_is_invalid(payload):
+    sort = payload[0] if isinstance(payload, list) else "-createdAt"
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(payload), sort, COLUMNS[sort])
+
+
+def test_cursor_for_other_sort_is_invalid():
+    cursor = encode_cursor("totalCost", 12.5, "abc")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "-totalCost", Order.totalCost)
@@ -0,0 +1,77 @@
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+from pypdf import PdfReader
+
+from app.exports.pdf import INVOICE_COLUMNS, iter_invoice_pdf
+
+INVOICE = {
+    "clientName": "Acme",
+    "institution": "Acme University",
+    "startDate": datetime(2024, 1, 1),
+    "endDate": datetime(2024, 1, 31),
+}
+
+
+def make_rows(n, product="Print"):
+    return [
+        (f"{product} {i}", 10, 0.5, 5.0, 1, None, None, datetime(2024, 1, 2))
+        for i in range(n)
+    ]
+
+
+def render(rows):
+    data = b"".join(iter_invoice_pdf(INVOICE, rows))
+    # strict mode raises on a broken xref table or object offsets
+    return PdfReader(BytesIO(data), strict=True)
+
+
+def page_texts(reader):
+    return [page.extract_text() for page in reader.pages]
+
+
+def test_empty_invoice_is_one_page_with_zero_total():
+    texts = page_texts(render([]))
+
+    assert len(texts) == 1
+    assert "Invoice for Acme" in texts[0]
+    assert "Total Amount: 0.00" in texts[0]
+
+
+@pytest.mark.parametrize("n", [1, 60, 250])
+def test_every_row_is_rendered_once_in_order(n):
+    text = "\n".join(page_texts(render(make_rows(n))))
+
+    positions = [text.index(f"Print {i} 10 0.50 5.00\n") for i in range(n)]
+    assert positions == sorted(positions)
+    assert text.count("Print ") == n
+
+
+def test_long_invoice_repeats_header_and_totals_on_last_page():
+    reader = render(make_rows(250))
+    texts = page_texts(reader)
+
+    assert len(texts) > 2
+    for number, text in enumerate(texts, start=1):
+        for title, _, _ in INVOICE_COLUMNS:
+            assert title in text
+        assert f"Page {number}" in text
+    assert "Invoice for Acme" in texts[0]
+    assert all("Invoice for" not in text for text in texts[1:])
+
+    assert all("Total Amount" not in text for text in texts[:-1])
+    assert "Total Amount: 1250.00" in texts[-1]
+
+
+def test_text_is_escaped_and_truncated():
+    rows = [
+        ("Notes (draft) \\ final", 1, 1.0, 1.0, 1, None, None, datetime(2024, 1, 2)),
+        ("Café " + "x" * 200, 1, 1.0, 1.0, 1, None, None, datetime(2024, 1, 2)),
+    ]
+    text = page_texts(render(rows))[0]
+
+    assert "Notes (draft) \\ final" in text
+    assert "Café xxx" in text
+    assert "x" * 200 not in text
+    assert "..." in text
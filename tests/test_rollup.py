@@ -0,0 +1,99 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models import db, DailyRevenue
+from app.rollup import (
+    daily_totals, eat_midnight_utc, rebuild_rollup, segmented_daily_totals, totals_within,
+    verify_rollup,
+)
+from app.services import create_order
+
+
+def place(catalog, created_at, pages=1):
+    client_id, product_id = catalog
+    create_order({
+        "clientId": client_id,
+        "productId": product_id,
+        "pagesOrSlides": pages,
+        "orderDate": created_at,
+    })
+
+
+def rollup_days():
+    rows = db.session.execute(
+        select(DailyRevenue.day, DailyRevenue.orders).order_by(DailyRevenue.day)
+    )
+    return [tuple(row) for row in rows]
+
+
+@pytest.fixture(params=["timestamptz", "timestamp"])
+def column_type(request, app):
+    """The model's timestamptz column, and a naive UTC one as older tables have."""
+    if request.param == "timestamp":
+        db.session.execute(text(
+            'ALTER TABLE orders ALTER COLUMN "createdAt" TYPE timestamp'
+            ' USING "createdAt" AT TIME ZONE \'UTC\''
+        ))
+        db.session.commit()
+    return request.param
+
+
+def test_orders_after_2100_utc_land_on_next_eat_day(catalog, column_type):
+    place(catalog, "2026-02-28T20:59:00+00:00")
+    place(catalog, "2026-02-28T21:01:00+00:00", pages=2)
+    place(catalog, "2026-03-01T20:30:00+00:00", pages=4)
+
+    assert rollup_days() == [
+        (date(2026, 2, 28), 1),
+        (date(2026, 3, 1), 2),
+    ]
+    assert verify_rollup() == []
+
+    rebuild_rollup()
+    db.session.commit()
+    assert rollup_days() == [
+        (date(2026, 2, 28), 1),
+        (date(2026, 3, 1), 2),
+    ]
+
+
+def test_daily_totals_split_ranges_at_eat_midnight(catalog, column_type):
+    for created_at in [
+        "2026-02-27T22:00:00+00:00",  # 28 Feb EAT
+        "2026-02-28T20:59:00+00:00",  # 28 Feb EAT
+        "2026-02-28T21:01:00+00:00",  # 1 Mar EAT
+        "2026-03-01T12:00:00+00:00",  # 1 Mar EAT
+        "2026-03-02T21:30:00+00:00",  # 3 Mar EAT
+    ]:
+        place(catalog, created_at)
+
+    start = eat_midnight_utc(date(2026, 2, 28))
+    end = eat_midnight_utc(date(2026, 3, 3))
+    assert [(day, n) for day, _, n in daily_totals(start, end)] == [
+        (date(2026, 2, 28), 2),
+        (date(2026, 3, 1), 2),
+    ]
+
+    # Partial edge days are read from orders and agree with the rollup
+    start = datetime(2026, 2, 28, 12, tzinfo=timezone.utc)
+    end = datetime(2026, 3, 2, 22, tzinfo=timezone.utc)
+    assert [(day, n) for day, _, n in daily_totals(start, end)] == [
+        (date(2026, 2, 28), 1),
+        (date(2026, 3, 1), 2),
+        (date(2026, 3, 3), 1),
+    ]
+
+
+def test_segmented_totals_match_daily_totals_per_range(catalog, column_type):
+    for hour in range(0, 24 * 6, 5):
+        place(catalog, (datetime(2026, 2, 26, tzinfo=timezone.utc) + timedelta(hours=hour)).isoformat())
+
+    current = (datetime(2026, 2, 28, 9, 30, tzinfo=timezone.utc), datetime(2026, 3, 3, 4, tzinfo=timezone.utc))
+    previous = (datetime(2026, 2, 26, 9, 30, tzinfo=timezone.utc), current[0])
+    trend = (eat_midnight_utc(date(2026, 2, 27)), datetime(2026, 3, 1, 17, tzinfo=timezone.utc))
+
+    segments = segmented_daily_totals([*current, *previous, *trend])
+    for start, end in (current, previous, trend):
+        assert totals_within(segments, start, end) == daily_totals(start, end)